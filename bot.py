@@ -44,6 +44,8 @@ from helpers.inverts import inverts_command
 from helpers.drive import drive_command
 from helpers.price import price_command
 from helpers.pages import pages_command
+from helpers.scheduler import run_light
+from helpers.scratch import sweep_scratch
 from group.settings import (
     uset_command, 
     settings_callback,
@@ -100,26 +102,26 @@ async def pdf_handler(client, message):
         return
     await drive_command(client, message)
 
-# Register PDF file handler
-@bot.on_message(filters.document & filters.private)
-async def pdf_handler(client, message):
-    if not await force_sub_check(client, message):
-        return
-    await handle_pdf(client, message)
-
 # Price calculation command
 @bot.on_message(filters.command("price") & filters.private)
 async def price_handler(client, message):
     if not await force_sub_check(client, message):
         return
-    await price_command(client, message)
+    await run_light(message.from_user.id, "/price", lambda: price_command(client, message))
 
 # Add pages command handler
 @bot.on_message(filters.command("pages") & filters.private)
 async def pages_handler(client, message):
     if not await force_sub_check(client, message):
         return
-    await pages_command(client, message)
+    await run_light(message.from_user.id, "/pages", lambda: pages_command(client, message))
+
+# Register PDF file handler after the commands a PDF can carry as its caption
+@bot.on_message(filters.document & filters.private)
+async def pdf_handler(client, message):
+    if not await force_sub_check(client, message):
+        return
+    await handle_pdf(client, message)
 
 @bot.on_message(filters.command("broadcast") & filters.private)
 async def broadcast_handler(client, message):
@@ -330,5 +332,8 @@ async def force_sub_check(client, message):
         return False
     return True
 
+# Remove temp files left behind by an earlier run
+sweep_scratch()
+
 # Start the bot
 bot.run() 
\ No newline at end of file
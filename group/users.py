@@ -3,6 +3,10 @@ from pyrogram.types import Message
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
 from dotenv import load_dotenv
+import humanize
+from helpers.cache import cache_stats, get_cache_size
+from helpers.state import job_counts, IDLE, QUEUED, RUNNING
+from helpers.scratch import scratch_usage
 
 # Load environment variables
 load_dotenv()
@@ -45,11 +49,23 @@ async def users_command(client: Client, message: Message):
             }
         })
         
+        jobs = job_counts()
+        
         await message.reply_text(
             "📊 **ব্যবহারকারী পরিসংখ্যান**\n\n"
             f"👥 **মোট ব্যবহারকারী:** {total_users:,}জন\n"
             f"📅 **আজকের নতুন:** {today_users:,}জন\n"
             f"✨ **২৪ ঘন্টায় সক্রিয়:** {active_users:,}জন\n\n"
+            "🗂️ **PDF ক্যাশ:**\n"
+            f"• হিট: {cache_stats['hits']:,}টি\n"
+            f"• মিস: {cache_stats['misses']:,}টি\n"
+            f"• সাইজ: {humanize.naturalsize(get_cache_size())}\n\n"
+            "⚙️ **চলমান কাজ:**\n"
+            f"• চলছে: {jobs[RUNNING]:,}টি\n"
+            f"• লাইনে: {jobs[QUEUED]:,}টি\n"
+            f"• ফাইলের অপেক্ষায় (/merge): {jobs['collecting']:,}টি\n"
+            f"• অলস: {jobs[IDLE]:,}টি\n"
+            f"• টেম্প জায়গা: {humanize.naturalsize(scratch_usage())}\n\n"
             "**📝 নোট:** শুধুমাত্র অ্যাডমিনরা এই তথ্য দেখতে পারবেন।"
         )
             
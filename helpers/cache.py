@@ -0,0 +1,168 @@
+from pyrogram.types import Message
+import os
+import shutil
+import tempfile
+import asyncio
+import time
+from typing import Dict
+
+# Shared cache of downloaded Telegram documents, keyed by file_unique_id
+CACHE_DIR = os.getenv('CACHE_DIR', os.path.join(tempfile.gettempdir(), "pdf_cache"))
+CACHE_MAX_SIZE = int(os.getenv('CACHE_MAX_SIZE', 1024)) * 1024 * 1024  # MB
+
+# Cache of Drive page images, keyed by Drive file id, page and width
+DRIVE_CACHE_DIR = os.getenv('DRIVE_CACHE_DIR', os.path.join(tempfile.gettempdir(), "drive_cache"))
+DRIVE_CACHE_MAX_SIZE = int(os.getenv('DRIVE_CACHE_MAX_SIZE', 1024)) * 1024 * 1024  # MB
+DRIVE_CACHE_MAX_AGE = int(os.getenv('DRIVE_CACHE_MAX_AGE', 3 * 24 * 60 * 60))  # Seconds
+
+cache_stats = {"hits": 0, "misses": 0}
+_inflight: Dict[str, asyncio.Task] = {}  # Downloads in progress per key
+_waiters: Dict[str, int] = {}  # Requests waiting on each download
+
+def evict(root: str, max_size: int, max_age: float = None) -> int:
+    """Delete least recently used files under root until it fits max_size.
+
+    Files older than max_age seconds are removed regardless of size.
+    Returns the number of bytes freed.
+    """
+    entries = []
+    for dir_path, _, file_names in os.walk(root):
+        for name in file_names:
+            if name.endswith(".temp"):
+                continue
+            path = os.path.join(dir_path, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+    # Oldest (least recently used) first
+    entries.sort()
+    total_size = sum(size for _, size, _ in entries)
+    now = time.time()
+    freed = 0
+
+    for mtime, size, path in entries:
+        expired = max_age is not None and now - mtime > max_age
+        if total_size - freed <= max_size and not expired:
+            break
+        try:
+            os.remove(path)
+            freed += size
+        except OSError:
+            pass
+
+    # Drop directories left empty
+    for dir_path, _, _ in os.walk(root, topdown=False):
+        if dir_path != root:
+            try:
+                os.rmdir(dir_path)
+            except OSError:
+                pass
+
+    return freed
+
+def get_cache_size() -> int:
+    """Total size of the document cache in bytes."""
+    total = 0
+    for dir_path, _, file_names in os.walk(CACHE_DIR):
+        for name in file_names:
+            try:
+                total += os.path.getsize(os.path.join(dir_path, name))
+            except OSError:
+                pass
+    return total
+
+def cache_path(file_unique_id: str) -> str:
+    """Path of a cached document."""
+    return os.path.join(CACHE_DIR, f"{file_unique_id}.pdf")
+
+def page_cache_path(drive_id: str, page: int, width: int) -> str:
+    """Path of a cached Drive page image."""
+    return os.path.join(DRIVE_CACHE_DIR, drive_id, str(width), f"{page:04}")
+
+def read_cached_page(drive_id: str, page: int, width: int):
+    """Read a cached Drive page. Returns None if it isn't cached."""
+    path = page_cache_path(drive_id, page, width)
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    os.utime(path)  # Mark as recently used
+    return data
+
+def store_cached_page(drive_id: str, page: int, width: int, data: bytes):
+    """Save a downloaded Drive page so later attempts can skip it."""
+    path = page_cache_path(drive_id, page, width)
+    temp_path = f"{path}.temp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    except OSError as e:
+        print(f"Page cache write error: {str(e)}")
+
+def evict_drive_cache() -> int:
+    """Trim the Drive page cache to its size and age limits."""
+    return evict(DRIVE_CACHE_DIR, DRIVE_CACHE_MAX_SIZE, DRIVE_CACHE_MAX_AGE)
+
+async def _download(message: Message, cached: str, progress, progress_args: tuple):
+    """Download a document into the cache."""
+    temp_path = f"{cached}.temp"
+    try:
+        await message.download(temp_path, progress=progress, progress_args=progress_args)
+
+        # Make room before adding the new file
+        evict(CACHE_DIR, max(0, CACHE_MAX_SIZE - os.path.getsize(temp_path)))
+        os.replace(temp_path, cached)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+async def download_cached(message: Message, file_path: str, progress=None, progress_args: tuple = ()) -> str:
+    """Download a message's document to file_path, reading through the cache.
+
+    A document that was downloaded before is linked (or copied) from the
+    cache without touching Telegram.
+    """
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    key = message.document.file_unique_id
+    cached = cache_path(key)
+
+    if os.path.exists(cached):
+        cache_stats["hits"] += 1
+        os.utime(cached)  # Mark as recently used
+    else:
+        cache_stats["misses"] += 1
+
+        # Share a download already running for the same document
+        task = _inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(_download(message, cached, progress, progress_args))
+            _inflight[key] = task
+            task.add_done_callback(lambda _: _inflight.pop(key, None))
+
+        _waiters[key] = _waiters.get(key, 0) + 1
+        try:
+            await asyncio.shield(task)
+        except asyncio.CancelledError:
+            # Stop the transfer once nobody is waiting for it
+            if _waiters[key] == 1:
+                task.cancel()
+            raise
+        finally:
+            _waiters[key] -= 1
+            if not _waiters[key]:
+                del _waiters[key]
+
+    if os.path.exists(file_path):
+        os.remove(file_path)
+    try:
+        os.link(cached, file_path)
+    except OSError:
+        shutil.copyfile(cached, file_path)
+
+    return file_path
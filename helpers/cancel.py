@@ -1,42 +1,24 @@
 from pyrogram import Client, filters
 from pyrogram.types import Message
-import os
-import shutil
 
 # Import state from state.py
-from .state import user_states, status_messages, message_locks, last_progress_update
+from .state import user_states, status_messages, message_locks, last_progress_update, cancel_job
+from .scheduler import cancel_queued
 
 async def cancel_command(client: Client, message: Message):
     """Cancel all ongoing operations for a user."""
     try:
         user_id = message.from_user.id
         
-        # First stop all ongoing processes
+        # Drop jobs still waiting in the queue
+        queued = await cancel_queued(user_id)
+        
+        # Kill worker processes, stop transfers and remove temp files
+        # right away instead of waiting for the job to notice
+        stopped = cancel_job(user_id)
+        
+        # Clean up state
         if user_id in user_states:
-            # Mark as not collecting to stop new files
-            if hasattr(user_states[user_id], 'collecting'):
-                user_states[user_id].collecting = False
-            
-            # Force stop any ongoing downloads/uploads
-            if user_id in status_messages:
-                try:
-                    # Delete the status message to stop progress updates
-                    await status_messages[user_id].delete()
-                except:
-                    pass
-            
-            # Clean up any temporary files that might be in use
-            try:
-                if hasattr(user_states[user_id], 'temp_dir'):
-                    temp_dir = user_states[user_id].temp_dir
-                    if temp_dir and os.path.exists(temp_dir):
-                        shutil.rmtree(temp_dir, ignore_errors=True)
-            except:
-                pass
-            
-            # Reset and clean up state
-            if hasattr(user_states[user_id], 'reset'):
-                user_states[user_id].reset()
             del user_states[user_id]
             
         # Remove progress tracking
@@ -55,12 +37,25 @@ async def cancel_command(client: Client, message: Message):
         if user_id in message_locks:
             del message_locks[user_id]
             
-        # Send confirmation
-        await message.reply_text("✅ সকল চলমান কমান্ড বাতিল করা হয়েছে।")
+        # Send confirmation with what was stopped
+        details = []
+        if stopped["commands"]:
+            details.append(f"• বন্ধ করা কমান্ড: {', '.join(stopped['commands'])}")
+        if queued:
+            details.append(f"• লাইন থেকে সরানো কাজ: {queued}টি")
+        if stopped["processes"]:
+            details.append(f"• বন্ধ করা ওয়ার্কার প্রসেস: {stopped['processes']}টি")
+        if stopped["tasks"]:
+            details.append(f"• থামানো ডাউনলোড/টাস্ক: {stopped['tasks']}টি")
+        
+        text = "✅ সকল চলমান কমান্ড বাতিল করা হয়েছে।"
+        if details:
+            text += "\n\n" + "\n".join(details)
+        await message.reply_text(text)
         
     except Exception as e:
         await message.reply_text(
             "❌ **এরর!**\n\n"
             f"বাতিল করতে সমস্যা হয়েছে। কারণ: {str(e)}\n"
             "দয়া করে আবার চেষ্টা করুন।"
-        ) 
\ No newline at end of file
+        )
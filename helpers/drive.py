@@ -1,32 +1,264 @@
 from pyrogram import Client, filters
 from pyrogram.types import Message
 import os
-import tempfile
 import time
 import re
-import requests
-import img2pdf
+import random
+import asyncio
+import aiohttp
 import humanize
+from typing import Dict, Optional, Tuple
 
 # Import state management
 from .state import status_messages, user_states, PDFMerger, last_progress_update
 from .cancel import cancel_command
+from .results import result_key, save_result, send_cached_result
+from .pool import run_in_thread
+from .cache import read_cached_page, store_cached_page, evict_drive_cache
+from .imagepdf import StreamingPDFWriter, to_jpeg, DEFAULT_DPI
+from .scratch import create_scratch_dir, reserve_scratch, release_scratch
+from .progress import progress, edit_or_reply, report_progress, progress_bar
+from .scheduler import run_heavy
 
-async def edit_or_reply(message: Message, user_id: int, text: str):
-    """Edit existing status message or send new one."""
-    try:
-        if user_id in status_messages:
-            try:
-                await status_messages[user_id].edit_text(text)
-                return
-            except Exception as e:
-                print(f"Edit error: {str(e)}")
+# Drive fetcher settings (DRIVE_BASE_URL can point at a local stand-in)
+DRIVE_BASE_URL = os.getenv('DRIVE_BASE_URL', 'https://drive.google.com')
+DRIVE_INITIAL_CONCURRENCY = int(os.getenv('DRIVE_INITIAL_CONCURRENCY', 4))
+DRIVE_MAX_CONCURRENCY = int(os.getenv('DRIVE_MAX_CONCURRENCY', 16))
+MAX_PAGES = 999
+PAGE_WIDTH = 1600
+
+# Quality tiers: requested page width and JPEG quality
+QUALITY_TIERS = {
+    "draft": (800, 60),
+    "standard": (PAGE_WIDTH, 85),
+    "print": (2400, 92),
+}
+DEFAULT_QUALITY = "standard"
+PAGE_RETRIES = 5
+RETRY_MAX_DELAY = 30  # Seconds
+PAGE_SIZE_ESTIMATE = 300 * 1024  # Bytes per page at PAGE_WIDTH, when no page was seen yet
+
+_session: Optional[aiohttp.ClientSession] = None
+
+async def get_session() -> aiohttp.ClientSession:
+    """Get the shared HTTP session, keeping connections to Drive alive."""
+    global _session
+    if _session is None or _session.closed:
+        _session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=DRIVE_MAX_CONCURRENCY * 2, ttl_dns_cache=300),
+            timeout=aiohttp.ClientTimeout(total=60)
+        )
+    return _session
+
+class AdaptiveLimiter:
+    """Concurrency limit that grows while requests succeed and halves on 429/5xx."""
+    
+    def __init__(self, initial: int, minimum: int, maximum: int):
+        self.limit = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.active = 0
+        self.successes = 0
+        self._condition = asyncio.Condition()
+    
+    async def __aenter__(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.active < self.limit)
+            self.active += 1
+    
+    async def __aexit__(self, *exc_info):
+        async with self._condition:
+            self.active -= 1
+            self._condition.notify_all()
+    
+    def on_success(self):
+        """Add one slot after a full window of healthy responses."""
+        self.successes += 1
+        if self.successes >= self.limit and self.limit < self.maximum:
+            self.limit += 1
+            self.successes = 0
+    
+    def on_backoff(self):
+        """Halve the limit when Drive pushes back."""
+        self.limit = max(self.minimum, self.limit // 2)
+        self.successes = 0
+
+def page_url(url_token: str, page: int, width: int = PAGE_WIDTH) -> str:
+    """URL of one rendered page image."""
+    return f"{DRIVE_BASE_URL}/viewer2/prod-01/img?ck=drive&ds={url_token}&authuser=0&page={page}&skiphighlight=true&w={width}&webp=true"
+
+async def fetch_page(session: aiohttp.ClientSession, limiter: AdaptiveLimiter, url_token: str, page: int, width: int = PAGE_WIDTH) -> Optional[bytes]:
+    """Download one page image. Returns None if the page doesn't exist."""
+    status = None
+    for attempt in range(PAGE_RETRIES + 1):
+        try:
+            async with limiter:
+                async with session.get(page_url(url_token, page, width)) as response:
+                    status = response.status
+                    if status == 200:
+                        data = await response.read()
+                        limiter.on_success()
+                        return data
+                    if status != 429 and status < 500:
+                        return None
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            status = str(e) or type(e).__name__
         
-        # If edit fails or no message exists, send new
-        status_messages[user_id] = await message.reply_text(text)
+        # Rate limited, server error or connection problem
+        limiter.on_backoff()
+        if attempt < PAGE_RETRIES:
+            # Exponential backoff with jitter so workers don't retry in lockstep
+            await asyncio.sleep(min(RETRY_MAX_DELAY, 2 ** attempt) + random.random())
+    
+    raise Exception(f"পেজ {page + 1} ডাউনলোড করা যায়নি ({status})")
+
+async def get_page(session: aiohttp.ClientSession, limiter: AdaptiveLimiter, drive_id: str, url_token: str, page: int, width: int = PAGE_WIDTH) -> Optional[bytes]:
+    """Get one page image from the page cache, or download and cache it."""
+    data = read_cached_page(drive_id, page, width)
+    if data is None:
+        data = await fetch_page(session, limiter, url_token, page, width)
+        if data is not None:
+            store_cached_page(drive_id, page, width, data)
+    return data
+
+async def fetch_page_count(session: aiohttp.ClientSession, url_token: str) -> Optional[int]:
+    """Read the page count from the viewer meta response."""
+    try:
+        async with session.get(f"{DRIVE_BASE_URL}/viewer2/prod-01/meta?ck=drive&ds={url_token}") as response:
+            if response.status != 200:
+                return None
+            meta = await response.text()
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        print(f"Drive meta error: {str(e) or type(e).__name__}")
+        return None
+    
+    match = re.search(r'"pages"\s*:\s*(\d+)', meta)
+    return int(match[1]) if match else None
+
+async def probe_page_count(session: aiohttp.ClientSession, limiter: AdaptiveLimiter, drive_id: str, url_token: str, width: int = PAGE_WIDTH) -> Tuple[int, Dict[int, bytes]]:
+    """Find the page count by probing page indexes.
+
+    Probes pages 1, 2, 4, 8... until one is missing, then binary searches
+    between the last page found and the first missing one. Returns the
+    count and the probed pages, so they don't have to be fetched again.
+    """
+    found: Dict[int, bytes] = {}
+    
+    async def exists(page: int) -> bool:
+        data = await get_page(session, limiter, drive_id, url_token, page, width)
+        if data is not None:
+            found[page] = data
+        return data is not None
+    
+    if not await exists(0):
+        return 0, found
+    
+    # Exponential search for an upper bound
+    last_found, first_missing = 0, None
+    page = 1
+    while page < MAX_PAGES:
+        if not await exists(page):
+            first_missing = page
+            break
+        last_found = page
+        page *= 2
+    if first_missing is None:
+        if await exists(MAX_PAGES - 1):
+            return MAX_PAGES, found
+        first_missing = MAX_PAGES - 1
+    
+    # Binary search for the last page
+    while first_missing - last_found > 1:
+        middle = (last_found + first_missing) // 2
+        if await exists(middle):
+            last_found = middle
+        else:
+            first_missing = middle
+    
+    return last_found + 1, found
+
+async def get_page_count(drive_id: str, url_token: str, width: int = PAGE_WIDTH) -> Tuple[int, Dict[int, bytes]]:
+    """Get the number of pages, from the meta response or by probing."""
+    session = await get_session()
+    page_count = await fetch_page_count(session, url_token)
+    if page_count is not None:
+        return min(page_count, MAX_PAGES), {}
+    
+    limiter = AdaptiveLimiter(1, 1, 1)
+    return await probe_page_count(session, limiter, drive_id, url_token, width)
+
+async def download_pages(drive_id: str, url_token: str, writer: StreamingPDFWriter, page_count: int, on_page, prefetched: Dict[int, bytes] = None, width: int = PAGE_WIDTH, quality: int = 85):
+    """Download a known number of pages concurrently into a PDF.
+
+    Each page is transcoded to JPEG in the thread pool and added to writer
+    as soon as all earlier pages are in, so only pages that arrived out of
+    order are held in memory. A worker doesn't start a page more than twice
+    the limiter's limit ahead of the next page to write, so one slow page
+    can't make the held pages pile up. on_page(size) is awaited after each
+    page.
+    Pages are requested at width and encoded at JPEG quality.
+    Pages in prefetched or the page cache are used without being
+    downloaded again, so a retried job only fetches the missing pages.
+    """
+    session = await get_session()
+    limiter = AdaptiveLimiter(DRIVE_INITIAL_CONCURRENCY, 1, DRIVE_MAX_CONCURRENCY)
+    prefetched = prefetched or {}
+    pages = iter(range(page_count))
+    pending: Dict[int, tuple] = {}  # Transcoded pages waiting for earlier ones
+    next_page = 0
+    # Same page size at every tier, only the resolution changes
+    dpi = DEFAULT_DPI * width / PAGE_WIDTH
+    written = asyncio.Condition()  # Notified when next_page moves on
+    
+    async def worker():
+        nonlocal next_page
+        for page in pages:
+            async with written:
+                await written.wait_for(lambda: page - next_page < 2 * limiter.limit)
             
-    except Exception as e:
-        print(f"Status update error: {str(e)}")
+            data = prefetched.pop(page, None)
+            if data is None:
+                data = await get_page(session, limiter, drive_id, url_token, page, width)
+            if data is None:
+                raise Exception(f"পেজ {page + 1} পাওয়া যায়নি")
+            
+            pending[page] = await run_in_thread(to_jpeg, data, quality)
+            
+            # Append every page that is now in order
+            if next_page in pending:
+                while next_page in pending:
+                    writer.add_jpeg(*pending.pop(next_page), dpi=dpi)
+                    next_page += 1
+                async with written:
+                    written.notify_all()
+            await on_page(len(data))
+    
+    workers = [asyncio.ensure_future(worker()) for _ in range(min(DRIVE_MAX_CONCURRENCY, page_count))]
+    try:
+        await asyncio.gather(*workers)
+    finally:
+        for task in workers:
+            task.cancel()
+        
+        # Pages stay cached after a failure, trim the cache in the background
+        asyncio.ensure_future(run_in_thread(evict_drive_cache))
+
+async def estimate_default_size(drive_id: str, url_token: str, tier: str, pdf_size: int) -> int:
+    """Estimate the output size at the default tier.
+
+    Scales pdf_size by how much page 1 grows or shrinks when encoded at the
+    default tier instead of the chosen one.
+    """
+    session = await get_session()
+    limiter = AdaptiveLimiter(1, 1, 1)
+    sizes = []
+    for width, quality in (QUALITY_TIERS[tier], QUALITY_TIERS[DEFAULT_QUALITY]):
+        data = await get_page(session, limiter, drive_id, url_token, 0, width)
+        if data is None:
+            return pdf_size
+        jpeg = (await run_in_thread(to_jpeg, data, quality))[0]
+        sizes.append(len(jpeg))
+    return int(pdf_size * sizes[1] / sizes[0])
 
 def extract_drive_id(url: str) -> str:
     """Extract Google Drive file ID from URL."""
@@ -43,13 +275,17 @@ def extract_drive_id(url: str) -> str:
     return None
 
 async def drive_command(client: Client, message: Message):
-    """Handle /pdf command for Google Drive PDF download."""
+    """Handle /pdf command for Google Drive PDF download.
+
+    Usage replies, link checks and cached results are sent right away,
+    only the conversion itself waits for a heavy job slot.
+    """
     try:
         user_id = message.from_user.id
         
         # Check command format
-        command_parts = message.text.split(" ", 1)
-        if len(command_parts) != 2:
+        command_parts = message.text.split()
+        if len(command_parts) not in (2, 3):
             await message.reply_text(
                 "🔰 **Google Drive PDF ডাউনলোডার**\n\n"
                 "**📝 ফিচারসমূহ:**\n"
@@ -64,6 +300,8 @@ async def drive_command(client: Client, message: Message):
                 "3️⃣ নিচের যেকোনো একটি ফরম্যাটে কমান্ড দিন:\n"
                 "   • `/pdf <Google Drive লিংক>`\n"
                 "   • `/pdf <ফাইল ID>`\n"
+                "   • `/pdf <লিংক> draft` - কম সাইজ, মোবাইলে পড়ার জন্য\n"
+                "   • `/pdf <লিংক> print` - বেশি কোয়ালিটি, প্রিন্টের জন্য\n"
                 "4️⃣ প্রসেস শেষ হওয়া পর্যন্ত অপেক্ষা করুন\n\n"
                 "**💡 উদাহরণ:**\n"
                 "1️⃣ লিংক দিয়ে:\n"
@@ -85,29 +323,56 @@ async def drive_command(client: Client, message: Message):
             await message.reply_text("❌ **ভুল Google Drive লিংক/ফাইল ID!**")
             return
         
+        # Quality tier
+        tier = command_parts[2].lower() if len(command_parts) == 3 else DEFAULT_QUALITY
+        if tier not in QUALITY_TIERS:
+            await message.reply_text(
+                "❌ **ভুল কোয়ালিটি!**\n\n"
+                f"ব্যবহার করুন: {', '.join(f'`{name}`' for name in QUALITY_TIERS)}"
+            )
+            return
+        
+        # Resend the earlier result if this Drive file was already converted
+        cache_key = result_key("pdf", [file_id], quality=tier)
+        if await send_cached_result(message, cache_key):
+            return
+        
+        await run_heavy(message, user_id, "/pdf", lambda: drive_document(client, message, file_id, tier, cache_key))
+    
+    except Exception as e:
+        await message.reply_text(
+            "❌ **এরর!**\n\n"
+            f"কারণ: {str(e)}\n"
+            "দয়া করে আবার চেষ্টা করুন।"
+        )
+
+async def drive_document(client: Client, message: Message, file_id: str, tier: str, cache_key: str):
+    """Convert a Drive file to PDF at a quality tier and send it. Runs as a heavy job."""
+    try:
+        user_id = message.from_user.id
+        width, quality = QUALITY_TIERS[tier]
+        
         # Initialize state for user
         if user_id in user_states:
             user_states[user_id].reset()
         user_states[user_id] = PDFMerger()
         
         # Create temp directory
-        temp_dir = tempfile.mkdtemp()
-        images_dir = os.path.join(temp_dir, "images")
-        os.makedirs(images_dir)
+        temp_dir = create_scratch_dir()
         output_path = os.path.join(temp_dir, "output.pdf")
+        writer = None
         
         try:
             # Start session
             await edit_or_reply(message, user_id, "🔍 **Google Drive ফাইল চেক করা হচ্ছে...**")
             
-            session = requests.Session()
-            response = session.get(
-                f'https://drive.google.com/file/d/{file_id}/view',
-            )
+            session = await get_session()
+            async with session.get(f'{DRIVE_BASE_URL}/file/d/{file_id}/view') as response:
+                page_html = await response.text()
             
             # Extract token and filename
-            token_match = re.search(r"https://drive\.google\.com/viewer2/prod-\d{2}/meta\?ck\\u003ddrive\\u0026ds\\u003d(.+?)\",", response.text)
-            name_match = re.search(r"itemJson: \[null,\"(.+?)\"", response.text)
+            token_match = re.search(r"https://drive\.google\.com/viewer2/prod-\d{2}/meta\?ck\\u003ddrive\\u0026ds\\u003d(.+?)\",", page_html)
+            name_match = re.search(r"itemJson: \[null,\"(.+?)\"", page_html)
             
             if not token_match or not name_match:
                 await message.reply_text("❌ **Google Drive ফাইল অ্যাক্সেস করা যাচ্ছে না!**")
@@ -116,84 +381,91 @@ async def drive_command(client: Client, message: Message):
             url_token = token_match[1]
             file_name = name_match[1][:-4]  # Remove .pdf
             
+            # Find out how many pages there are
+            page_count, prefetched = await user_states[user_id].track(get_page_count(file_id, url_token, width))
+            
+            if page_count == 0:
+                await message.reply_text("❌ **কোনো পেজ পাওয়া যায়নি!**")
+                return
+            
+            # Room for the PDF, judged by the pages probed so far
+            if prefetched:
+                page_size = sum(len(data) for data in prefetched.values()) / len(prefetched)
+            else:
+                page_size = PAGE_SIZE_ESTIMATE * (width / PAGE_WIDTH) ** 2
+            reserve_scratch(temp_dir, int(page_size * page_count))
+            
             # Download pages
-            page_count = 0
-            downloaded_size = 0
+            downloaded = {'pages': 0, 'size': 0}
             start_time = time.time()
             
-            for i in range(999):  # Max 999 pages
-                # Check if cancelled
-                if user_id not in user_states:
-                    return
-                
-                # Download page
-                image_url = f"https://drive.google.com/viewer2/prod-01/img?ck=drive&ds={url_token}&authuser=0&page={i}&skiphighlight=true&w=1600&webp=true"
-                img_response = session.get(image_url)
-                
-                if img_response.status_code != 200:
-                    break
+            async def on_page(size: int):
+                downloaded['pages'] += 1
+                downloaded['size'] += size
                 
-                # Save page
-                page_path = os.path.join(images_dir, f"{str(i).zfill(3)}.png")
-                with open(page_path, "wb") as f:
-                    f.write(img_response.content)
+                # Calculate speed and ETA
+                elapsed_time = time.time() - start_time
+                speed = downloaded['size'] / elapsed_time if elapsed_time > 0 else 0
+                pages_per_second = downloaded['pages'] / elapsed_time if elapsed_time > 0 else 0
+                eta = (page_count - downloaded['pages']) / pages_per_second if pages_per_second > 0 else 0
+                percentage = downloaded['pages'] * 100 / page_count
                 
-                # Update progress
-                page_count = i + 1
-                downloaded_size += len(img_response.content)
-                
-                # Update status every 5 seconds
-                now = time.time()
-                if user_id not in last_progress_update or (now - last_progress_update.get(user_id, 0)) >= 5.0:
-                    last_progress_update[user_id] = now
-                    
-                    # Calculate speed and ETA
-                    elapsed_time = now - start_time
-                    speed = downloaded_size / elapsed_time if elapsed_time > 0 else 0
-                    
-                    await edit_or_reply(
-                        message,
-                        user_id,
-                        f"📥 **পেজ ডাউনলোড করা হচ্ছে...**\n\n"
-                        f"• ফাইল: {file_name}\n"
-                        f"• পেজ: {page_count}টি\n"
-                        f"• সাইজ: {humanize.naturalsize(downloaded_size)}\n"
-                        f"• স্পীড: {humanize.naturalsize(speed)}/s"
-                    )
+                # Shown every few seconds, only the latest update counts
+                report_progress(
+                    message,
+                    user_id,
+                    f"📥 **পেজ ডাউনলোড করা হচ্ছে...**\n\n"
+                    f"• ফাইল: {file_name}\n"
+                    f"{progress_bar(percentage)} {percentage:.1f}%\n"
+                    f"• পেজ: {downloaded['pages']}/{page_count}টি\n"
+                    f"• সাইজ: {humanize.naturalsize(downloaded['size'])}\n"
+                    f"• স্পীড: {humanize.naturalsize(speed)}/s\n"
+                    f"• বাকি সময়: {humanize.naturaltime(eta, future=True)}"
+                )
             
-            if page_count == 0:
-                await message.reply_text("❌ **কোনো পেজ পাওয়া যায়নি!**")
-                return
+            # Pages are written to the PDF while they download
+            writer = StreamingPDFWriter(output_path)
+            await user_states[user_id].track(
+                download_pages(file_id, url_token, writer, page_count, on_page, prefetched, width, quality)
+            )
             
-            # Convert to PDF
+            # Finish PDF
             await edit_or_reply(message, user_id, "📄 **PDF তৈরি করা হচ্ছে...**")
+            writer.close()
+            writer = None
             
-            # Get all images
-            images = []
-            for i in range(page_count):
-                page_path = os.path.join(images_dir, f"{str(i).zfill(3)}.png")
-                if os.path.exists(page_path):
-                    images.append(page_path)
-            
-            # Convert to PDF
-            with open(output_path, "wb") as f:
-                f.write(img2pdf.convert(images))
+            # Compare with the size at the default tier
+            output_size = os.path.getsize(output_path)
+            savings_text = ""
+            if tier != DEFAULT_QUALITY:
+                default_size = await user_states[user_id].track(
+                    estimate_default_size(file_id, url_token, tier, output_size)
+                )
+                saved = default_size - output_size
+                if saved >= 0:
+                    savings_text = f"• সাশ্রয় ({DEFAULT_QUALITY} এর তুলনায়): ~{humanize.naturalsize(saved)}\n"
+                else:
+                    savings_text = f"• বাড়তি সাইজ ({DEFAULT_QUALITY} এর তুলনায়): ~{humanize.naturalsize(-saved)}\n"
             
             # Send PDF
-            pdf_size = os.path.getsize(output_path) / (1024 * 1024)  # MB
+            pdf_size = output_size / (1024 * 1024)  # MB
             start_time = time.time()
             
             await edit_or_reply(message, user_id, "📤 **PDF পাঠানো হচ্ছে...**")
             
-            await message.reply_document(
+            caption = (
+                "✅ **Google Drive PDF ডাউনলোড করা হয়েছে!**\n\n"
+                f"• ফাইল: {file_name}.pdf\n"
+                f"• মোট পেজ: {page_count}টি\n"
+                f"• কোয়ালিটি: {tier}\n"
+                f"• ফাইল সাইজ: {pdf_size:.1f} MB\n"
+                f"{savings_text}"
+            ).rstrip()
+            
+            sent = await message.reply_document(
                 document=output_path,
                 file_name=f"{file_name}.pdf",
-                caption=(
-                    "✅ **Google Drive PDF ডাউনলোড করা হয়েছে!**\n\n"
-                    f"• ফাইল: {file_name}.pdf\n"
-                    f"• মোট পেজ: {page_count}টি\n"
-                    f"• ফাইল সাইজ: {pdf_size:.1f} MB"
-                ),
+                caption=caption,
                 progress=progress,
                 progress_args=(
                     message,
@@ -202,21 +474,22 @@ async def drive_command(client: Client, message: Message):
                     start_time
                 )
             )
+            await save_result(cache_key, sent, caption)
             
+        except asyncio.CancelledError:
+            # Stopped by /allcancel
+            if user_id in user_states:
+                raise
         except Exception as e:
             raise e
         finally:
             # Clean up temp files
             try:
-                if os.path.exists(images_dir):
-                    for file in os.listdir(images_dir):
-                        os.remove(os.path.join(images_dir, file))
-                    os.rmdir(images_dir)
-                if os.path.exists(output_path):
-                    os.remove(output_path)
-                os.rmdir(temp_dir)
+                if writer:
+                    writer.abort()
             except:
                 pass
+            release_scratch(temp_dir)
             
             # Clean up state
             if user_id in status_messages:
@@ -249,41 +522,4 @@ async def drive_command(client: Client, message: Message):
             "❌ **এরর!**\n\n"
             f"কারণ: {str(e)}\n"
             "দয়া করে আবার চেষ্টা করুন।"
-        ) 
-
-async def progress(current: int, total: int, message: Message, user_id: int, text: str, start_time: float):
-    """Update progress with rate limiting."""
-    try:
-        now = time.time()
-        
-        # Check if operation was cancelled
-        if user_id not in user_states:
-            return
-        
-        # Update only if enough time has passed (5 seconds)
-        if user_id not in last_progress_update or (now - last_progress_update.get(user_id, 0)) >= 5.0:
-            last_progress_update[user_id] = now
-            
-            # Calculate progress
-            percentage = (current * 100) / total if total > 0 else 0
-            elapsed_time = time.time() - start_time if start_time else 0
-            speed = current / elapsed_time if elapsed_time > 0 else 0
-            eta = (total - current) / speed if speed > 0 else 0
-            
-            # Generate progress bar
-            progress_bar = "".join(
-                "█" if i <= percentage / 5 else "░"
-                for i in range(20)
-            )
-            
-            status_text = (
-                f"{text}\n\n"
-                f"{progress_bar} {percentage:.1f}%\n"
-                f"⚡ স্পীড: {humanize.naturalsize(speed)}/s\n"
-                f"⏱️ বাকি সময়: {humanize.naturaltime(eta, future=True)}"
-            )
-            
-            await edit_or_reply(message, user_id, status_text)
-            
-    except Exception as e:
-        print(f"Progress update error: {str(e)}") 
+        )
@@ -0,0 +1,109 @@
+from PIL import Image
+import io
+from typing import List, Tuple
+
+# Pages without DPI information are assumed to be 96 DPI (same as img2pdf)
+DEFAULT_DPI = 96
+
+def to_jpeg(data: bytes, quality: int = 85) -> Tuple[bytes, int, int, str]:
+    """Transcode an image (e.g. WebP) to JPEG so a PDF can embed it as is.
+
+    Returns the JPEG bytes, width, height and PIL mode ("RGB" or "L").
+    """
+    with Image.open(io.BytesIO(data)) as img:
+        # JPEGs are embedded unchanged
+        if img.format == "JPEG" and img.mode in ("RGB", "L"):
+            return data, img.width, img.height, img.mode
+
+        if img.mode in ("RGBA", "LA", "P"):
+            # Flatten transparency onto white
+            img = img.convert("RGBA")
+            background = Image.new("RGB", img.size, (255, 255, 255))
+            background.paste(img, mask=img.split()[3])
+            img = background
+        elif img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+
+        out = io.BytesIO()
+        img.save(out, format="JPEG", quality=quality, optimize=True)
+        return out.getvalue(), img.width, img.height, img.mode
+
+class StreamingPDFWriter:
+    """Write a PDF of JPEG pages one page at a time.
+
+    Each page is written to disk as soon as it is added, so memory use
+    doesn't grow with the number of pages.
+    """
+
+    def __init__(self, path: str):
+        self.file = open(path, "wb")
+        self.offsets = {}  # Object number -> byte offset
+        self.kids: List[int] = []  # Page object numbers
+        self.next_object = 3  # 1 = catalog, 2 = page tree (written last)
+        self.page_count = 0
+
+        self.file.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        self._write_object(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+
+    def _write_object(self, number: int, body: bytes, stream: bytes = None):
+        self.offsets[number] = self.file.tell()
+        self.file.write(b"%d 0 obj\n" % number)
+        self.file.write(body)
+        if stream is not None:
+            self.file.write(b"\nstream\n")
+            self.file.write(stream)
+            self.file.write(b"\nendstream")
+        self.file.write(b"\nendobj\n")
+
+    def _new_object(self) -> int:
+        number = self.next_object
+        self.next_object += 1
+        return number
+
+    def add_jpeg(self, data: bytes, width: int, height: int, mode: str, dpi: float = DEFAULT_DPI):
+        """Append a page showing a JPEG image at its natural size."""
+        page_width = width * 72 / dpi
+        page_height = height * 72 / dpi
+        image_number = self._new_object()
+        content_number = self._new_object()
+        page_number = self._new_object()
+
+        color_space = b"/DeviceGray" if mode == "L" else b"/DeviceRGB"
+        self._write_object(
+            image_number,
+            b"<< /Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace %s "
+            b"/BitsPerComponent 8 /Filter /DCTDecode /Length %d >>" % (width, height, color_space, len(data)),
+            data
+        )
+
+        content = b"q %.4f 0 0 %.4f 0 0 cm /Im0 Do Q" % (page_width, page_height)
+        self._write_object(content_number, b"<< /Length %d >>" % len(content), content)
+
+        self._write_object(
+            page_number,
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %.4f %.4f] "
+            b"/Resources << /XObject << /Im0 %d 0 R >> >> /Contents %d 0 R >>"
+            % (page_width, page_height, image_number, content_number)
+        )
+        self.kids.append(page_number)
+        self.page_count += 1
+
+    def close(self):
+        """Write the page tree, cross-reference table and trailer."""
+        kids = b" ".join(b"%d 0 R" % number for number in self.kids)
+        self._write_object(2, b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(self.kids)))
+
+        xref_offset = self.file.tell()
+        self.file.write(b"xref\n0 %d\n" % self.next_object)
+        self.file.write(b"0000000000 65535 f \n")
+        for number in range(1, self.next_object):
+            self.file.write(b"%010d 00000 n \n" % self.offsets[number])
+        self.file.write(
+            b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+            % (self.next_object, xref_offset)
+        )
+        self.file.close()
+
+    def abort(self):
+        """Close the file without finishing the PDF."""
+        self.file.close()
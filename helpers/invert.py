@@ -1,73 +1,76 @@
 from pyrogram import Client, filters
 from pyrogram.types import Message
 import os
-import tempfile
 import time
 import fitz
-import numpy as np
-from PIL import Image
-import io
-import humanize
+import asyncio
+from typing import Dict, Set
 
 # Import state management
 from .state import status_messages, user_states, PDFMerger, last_progress_update
 from .cancel import cancel_command
+from .cache import download_cached
+from .results import result_key, save_result, send_cached_result
+from .metadata import get_metadata, index_pdf, known_dark_pages
+from .pool import run_in_process, WORKER_PROCESSES
+from .render import split_pages, invert_page_range, assemble_pages, timing_summary, vector_invert_document, DARK_THRESHOLD
+from .cache import cache_path
+from .scratch import create_scratch_dir, reserve_scratch, release_scratch
+from .progress import progress, edit_or_reply, report_progress
+from .scheduler import run_heavy
 
-async def edit_or_reply(message: Message, user_id: int, text: str):
-    """Edit existing status message or send new one."""
-    try:
-        if user_id in status_messages:
-            try:
-                await status_messages[user_id].edit_text(text)
-                return
-            except Exception as e:
-                print(f"Edit error: {str(e)}")
-        
-        # If edit fails or no message exists, send new
-        status_messages[user_id] = await message.reply_text(text)
-            
-    except Exception as e:
-        print(f"Status update error: {str(e)}")
+async def invert_pages(message: Message, user_id: int, input_path: str, total_pages: int, worker=invert_page_range, dark_pages: Set[int] = None) -> Dict:
+    """Run a page range worker over a PDF, spreading ranges across processes.
 
-async def progress(current: int, total: int, message: Message, user_id: int, text: str, start_time: float):
-    """Update progress with rate limiting."""
-    try:
-        now = time.time()
-        
-        # Check if operation was cancelled
-        if user_id not in user_states:
-            return
+    dark_pages, when known from the metadata index, lets the workers skip
+    classifying pages. Returns the inverted page images, dark and empty
+    page numbers (if the worker detects them) and per-page timings.
+    """
+    state = user_states[user_id]
+    inverted = {}
+    dark = []
+    empty_pages = []
+    timings = []
+    done_pages = 0
+    
+    async def run_range(start: int, end: int):
+        result = await run_in_process(worker, input_path, start, end, dark_pages)
+        return end - start, result
+    
+    tasks = [
+        state.track(run_range(start, end))
+        for start, end in split_pages(total_pages, WORKER_PROCESSES)
+    ]
+    
+    for next_done in asyncio.as_completed(tasks):
+        page_count, result = await next_done
+        done_pages += page_count
+        inverted.update(result['inverted'])
+        dark.extend(result['dark'])
+        empty_pages.extend(result.get('empty', []))
+        timings.extend(result['timings'])
         
-        # Update only if enough time has passed (5 seconds)
-        if user_id not in last_progress_update or (now - last_progress_update.get(user_id, 0)) >= 5.0:
-            last_progress_update[user_id] = now
-            
-            # Calculate progress
-            percentage = (current * 100) / total if total > 0 else 0
-            elapsed_time = time.time() - start_time if start_time else 0
-            speed = current / elapsed_time if elapsed_time > 0 else 0
-            eta = (total - current) / speed if speed > 0 else 0
-            
-            # Generate progress bar
-            progress_bar = "".join(
-                "█" if i <= percentage / 5 else "░"
-                for i in range(20)
-            )
-            
-            status_text = (
-                f"{text}\n\n"
-                f"{progress_bar} {percentage:.1f}%\n"
-                f"⚡ স্পীড: {humanize.naturalsize(speed)}/s\n"
-                f"⏱️ বাকি সময়: {humanize.naturaltime(eta, future=True)}"
-            )
-            
-            await edit_or_reply(message, user_id, status_text)
-            
-    except Exception as e:
-        print(f"Progress update error: {str(e)}")
+        # Update status, coalesced so page ranges finishing together cost one edit
+        empty_text = f"\n• খালি পেজ: {len(empty_pages)}টি" if 'empty' in result else ""
+        report_progress(
+            message,
+            user_id,
+            f"🔄 **PDF প্রসেস করা হচ্ছে...**\n\n"
+            f"• পেজ: {done_pages}/{total_pages}\n"
+            f"• ইনভার্টেড: {len(inverted)}টি{empty_text}"
+        )
+    
+    timings.sort()
+    print(f"Invert timings for user {user_id}: {timing_summary(timings)}")
+    
+    return {'inverted': inverted, 'dark': sorted(dark), 'empty': sorted(empty_pages), 'timings': timings}
 
 async def invert_command(client: Client, message: Message):
-    """Handle /invert command on PDF files."""
+    """Handle /invert command on PDF files.
+
+    Usage replies and cached results are sent right away, only the
+    inverting itself waits for a heavy job slot.
+    """
     try:
         user_id = message.from_user.id
         
@@ -78,7 +81,8 @@ async def invert_command(client: Client, message: Message):
                 "❌ **দয়া করে একটি PDF ফাইলে রিপ্লাই দিয়ে /invert কমান্ড দিন।**\n\n"
                 "**📝 ফিচারসমূহ:**\n"
                 "• ডার্ক পেজগুলো স্বয়ংক্রিয়ভাবে ইনভার্ট হবে\n"
-                "• লাইট পেজগুলো আগের মতই থাকবে\n\n"
+                "• লাইট পেজগুলো আগের মতই থাকবে\n"
+                "• `/invert vector` - টেক্সট ও ভেক্টর ঠিক রেখে ইনভার্ট (ছোট সাইজ)\n\n"
                 "**🔄 ব্যবহার পদ্ধতি:**\n"
                 "1️⃣ PDF ফাইলটি পাঠান\n"
                 "2️⃣ ফাইলে রিপ্লাই দিয়ে /invert কমান্ড দিন\n"
@@ -86,17 +90,53 @@ async def invert_command(client: Client, message: Message):
             )
             return
         
+        # Vector mode keeps text and drawings instead of rasterizing pages
+        args = message.text.split()[1:]
+        vector_mode = bool(args) and args[0].lower() in ("vector", "-v")
+        mode = "vector" if vector_mode else "raster"
+        
+        # Resend the earlier result if this file was already inverted
+        cache_key = result_key(
+            "invert",
+            [message.reply_to_message.document.file_unique_id],
+            mode=mode,
+            dark_threshold=DARK_THRESHOLD
+        )
+        if await send_cached_result(message, cache_key):
+            return
+        
+        await run_heavy(
+            message, user_id, "/invert",
+            lambda: invert_document(client, message, vector_mode, cache_key)
+        )
+    
+    except Exception as e:
+        await message.reply_text(
+            "❌ **এরর!**\n\n"
+            f"কারণ: {str(e)}\n"
+            "দয়া করে আবার চেষ্টা করুন।"
+        )
+
+async def invert_document(client: Client, message: Message, vector_mode: bool, cache_key: str):
+    """Download, invert and send the replied PDF. Runs as a heavy job."""
+    try:
+        user_id = message.from_user.id
+        
         # Initialize state for user
         if user_id in user_states:
             await cancel_command(client, message)
         user_states[user_id] = PDFMerger()
         
         # Create temp directory
-        temp_dir = tempfile.mkdtemp()
+        file_size = message.reply_to_message.document.file_size
+        temp_dir = create_scratch_dir(file_size * 2)
         input_path = os.path.join(temp_dir, "input.pdf")
         output_path = os.path.join(temp_dir, "inverted.pdf")
         
         try:
+            # Room for the input and the output
+            reserve_scratch(temp_dir, file_size * 2)
+            
             # Download PDF
             start_time = time.time()
             await edit_or_reply(message, user_id, "📥 **PDF ডাউনলোড করা হচ্ছে...**")
@@ -105,7 +145,8 @@ async def invert_command(client: Client, message: Message):
             if user_id not in user_states:
                 return
                 
-            await message.reply_to_message.download(
+            await download_cached(
+                message.reply_to_message,
                 input_path,
                 progress=progress,
                 progress_args=(
@@ -120,85 +161,49 @@ async def invert_command(client: Client, message: Message):
             if user_id not in user_states:
                 return
             
-            # Open PDF
-            doc = fitz.open(input_path)
-            out_pdf = fitz.open()
-            
-            # Copy metadata
-            out_pdf.metadata = doc.metadata
+            # Get page count
+            document = message.reply_to_message.document
+            metadata = await get_metadata(document.file_unique_id)
+            if metadata and "page_count" in metadata:
+                total_pages = metadata["page_count"]
+            else:
+                doc = fitz.open(input_path)
+                total_pages = doc.page_count
+                doc.close()
             
-            # Process pages
-            total_pages = doc.page_count
-            inverted_count = 0
-            for page_num in range(total_pages):
-                # Check if cancelled
-                if user_id not in user_states:
-                    doc.close()
-                    out_pdf.close()
-                    return
-                
-                # Update status
-                await edit_or_reply(
-                    message, 
-                    user_id,
-                    f"🔄 **PDF প্রসেস করা হচ্ছে...**\n\n"
-                    f"• পেজ: {page_num + 1}/{total_pages}\n"
-                    f"• ইনভার্টেড: {inverted_count}টি"
+            mode_text = ""
+            index_fields = {}
+            if vector_mode:
+                # Rewrite colors in a worker process, scans fall back to raster
+                await edit_or_reply(message, user_id, "🔄 **PDF প্রসেস করা হচ্ছে (ভেক্টর মোড)...**")
+                result = await user_states[user_id].track(
+                    run_in_process(vector_invert_document, input_path, output_path)
                 )
+                inverted_count = len(result['inverted']) + len(result['rasterized'])
+                index_fields = {
+                    "dark_pages": sorted(result['inverted'] + result['rasterized']),
+                    "dark_threshold": DARK_THRESHOLD,
+                    "scanned_pages": result['scanned']
+                }
+                mode_text = f"• মোড: ভেক্টর (ইমেজে রূপান্তর: {len(result['rasterized'])}টি পেজ)\n"
+            else:
+                # Render and invert pages in parallel worker processes
+                result = await invert_pages(
+                    message, user_id, input_path, total_pages,
+                    dark_pages=known_dark_pages(metadata)
+                )
+                inverted = result['inverted']
+                inverted_count = len(inverted)
+                index_fields = {"dark_pages": result['dark'], "dark_threshold": DARK_THRESHOLD}
                 
-                page = doc[page_num]
-                
-                # Get pixmap with optimized resolution
-                zoom = 1.0
-                mat = fitz.Matrix(zoom, zoom)
-                pix = page.get_pixmap(matrix=mat, alpha=False)
-                
-                # Convert to numpy array for faster processing
-                img_array = np.frombuffer(pix.samples, dtype=np.uint8)
-                img_array = img_array.reshape(pix.height, pix.width, 3)
-                
-                # Quick check for dark background
-                is_dark = np.mean(img_array) < 128
-                
-                if is_dark:
-                    # Fast inversion
-                    img_array = 255 - img_array
-                    inverted_count += 1
-                    
-                    # Convert to bytes
-                    img = Image.fromarray(img_array)
-                    img_bytes = io.BytesIO()
-                    img.save(img_bytes, format='JPEG', quality=85, optimize=True)
-                    
-                    # Create new page
-                    new_page = out_pdf.new_page(width=page.rect.width,
-                                              height=page.rect.height)
-                    
-                    # Insert inverted image
-                    new_page.insert_image(page.rect, 
-                                        stream=img_bytes.getvalue(),
-                                        keep_proportion=True)
-                else:
-                    # Copy original page if not dark
-                    out_pdf.insert_pdf(doc, from_page=page_num, to_page=page_num)
-            
-            # Check if cancelled
-            if user_id not in user_states:
-                doc.close()
-                out_pdf.close()
-                return
-            
-            # Save optimized PDF
-            await edit_or_reply(message, user_id, "📄 **ইনভার্টেড PDF সেভ করা হচ্ছে...**")
-            out_pdf.save(output_path,
-                        garbage=4,
-                        deflate=True,
-                        clean=True,
-                        linear=True)
+                # Save optimized PDF
+                await edit_or_reply(message, user_id, "📄 **ইনভার্টেড PDF সেভ করা হচ্ছে...**")
+                await user_states[user_id].track(
+                    run_in_process(assemble_pages, input_path, output_path, inverted)
+                )
             
-            # Close documents
-            doc.close()
-            out_pdf.close()
+            # Remember what was learned about the file
+            index_pdf(document, cache_path(document.file_unique_id), metadata, **index_fields)
             
             # Send inverted PDF
             start_time = time.time()
@@ -215,17 +220,20 @@ async def invert_command(client: Client, message: Message):
             original_name = message.reply_to_message.document.file_name
             inverted_name = f"inverted_{original_name}"
             
-            await message.reply_document(
+            caption = (
+                "✅ **PDF ইনভার্ট করা হয়েছে!**\n\n"
+                f"• অরিজিনাল ফাইল: {original_name}\n"
+                f"• মোট পেজ: {total_pages}টি\n"
+                f"• অনভার্টেড: {inverted_count}টি\n"
+                f"{mode_text}"
+                f"• অরিজিনাল সাইজ: {orig_size:.1f} MB\n"
+                f"• নতুন সাইজ: {new_size:.1f} MB"
+            )
+            
+            sent = await message.reply_document(
                 document=output_path,
                 file_name=inverted_name,
-                caption=(
-                    "✅ **PDF ইনভার্ট করা হয়েছে!**\n\n"
-                    f"• অরিজিনাল ফাইল: {original_name}\n"
-                    f"• মোট পেজ: {total_pages}টি\n"
-                    f"• অনভার্টেড: {inverted_count}টি\n"
-                    f"• অরিজিনাল সাইজ: {orig_size:.1f} MB\n"
-                    f"• নতুন সাইজ: {new_size:.1f} MB"
-                ),
+                caption=caption,
                 progress=progress,
                 progress_args=(
                     message,
@@ -234,19 +242,17 @@ async def invert_command(client: Client, message: Message):
                     start_time
                 )
             )
+            await save_result(cache_key, sent, caption)
             
+        except asyncio.CancelledError:
+            # Stopped by /allcancel
+            if user_id in user_states:
+                raise
         except Exception as e:
             raise e
         finally:
             # Clean up temp files
-            try:
-                if os.path.exists(input_path):
-                    os.remove(input_path)
-                if os.path.exists(output_path):
-                    os.remove(output_path)
-                os.rmdir(temp_dir)
-            except:
-                pass
+            release_scratch(temp_dir)
             
             # Clean up state
             if user_id in status_messages:
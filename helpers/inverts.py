@@ -1,114 +1,32 @@
 from pyrogram import Client, filters
 from pyrogram.types import Message
 import os
-import tempfile
 import time
 import fitz
-import numpy as np
-from PIL import Image
-import io
-import humanize
+import asyncio
 
 # Import state management
 from .state import status_messages, user_states, PDFMerger, last_progress_update
 from .cancel import cancel_command
-
-async def edit_or_reply(message: Message, user_id: int, text: str):
-    """Edit existing status message or send new one."""
-    try:
-        if user_id in status_messages:
-            try:
-                await status_messages[user_id].edit_text(text)
-                return
-            except Exception as e:
-                print(f"Edit error: {str(e)}")
-        
-        # If edit fails or no message exists, send new
-        status_messages[user_id] = await message.reply_text(text)
-            
-    except Exception as e:
-        print(f"Status update error: {str(e)}")
-
-def analyze_page(page, zoom=2.0):
-    """Analyze page content using AI-powered detection."""
-    try:
-        # Create matrix for higher resolution analysis
-        mat = fitz.Matrix(zoom, zoom)
-        pix = page.get_pixmap(matrix=mat, alpha=False)
-        
-        # Convert to numpy array
-        img_array = np.frombuffer(pix.samples, dtype=np.uint8)
-        img_array = img_array.reshape(pix.height, pix.width, 3)
-        
-        # Convert to grayscale
-        gray = np.dot(img_array[...,:3], [0.2989, 0.5870, 0.1140])
-        
-        # Thresholding
-        binary = gray < 250
-        
-        # Calculate content percentage
-        content_percentage = np.mean(binary)
-        
-        # Advanced empty page detection
-        is_empty = content_percentage < 0.03  # Less than 3% content
-        
-        return {
-            'content_percentage': content_percentage,
-            'is_empty': is_empty
-        }
-        
-    except Exception as e:
-        print(f"Page analysis error: {str(e)}")
-        return None
-
-async def progress(current: int, total: int, message: Message, user_id: int, text: str, start_time: float):
-    """Update progress with rate limiting."""
-    try:
-        now = time.time()
-        
-        # Check if operation was cancelled
-        if user_id not in user_states:
-            return
-        
-        # Update only if enough time has passed (5 seconds)
-        if user_id not in last_progress_update or (now - last_progress_update.get(user_id, 0)) >= 5.0:
-            last_progress_update[user_id] = now
-            
-            # Calculate progress
-            percentage = (current * 100) / total if total > 0 else 0
-            elapsed_time = time.time() - start_time if start_time else 0
-            speed = current / elapsed_time if elapsed_time > 0 else 0
-            eta = (total - current) / speed if speed > 0 else 0
-            
-            # Generate progress bar
-            progress_bar = "".join(
-                "█" if i <= percentage / 5 else "░"
-                for i in range(20)
-            )
-            
-            status_text = (
-                f"{text}\n\n"
-                f"{progress_bar} {percentage:.1f}%\n"
-                f"⚡ স্পীড: {humanize.naturalsize(speed)}/s\n"
-                f"⏱️ বাকি সময়: {humanize.naturaltime(eta, future=True)}"
-            )
-            
-            await edit_or_reply(message, user_id, status_text)
-            
-    except Exception as e:
-        print(f"Progress update error: {str(e)}")
+from .cache import download_cached, cache_path
+from .results import result_key, save_result, send_cached_result
+from .metadata import get_metadata, index_pdf, known_dark_pages
+from .pool import run_in_process
+from .render import invert_and_analyze_range, assemble_pages, DARK_THRESHOLD, EMPTY_CONTENT_RATIO
+from .invert import invert_pages
+from .scratch import create_scratch_dir, reserve_scratch, release_scratch
+from .progress import progress, edit_or_reply
+from .scheduler import run_heavy
 
 async def inverts_command(client: Client, message: Message):
-    """Handle /inverts command - Invert PDF and remove empty pages."""
+    """Handle /inverts command - Invert PDF and remove empty pages.
+
+    Usage replies and cached results are sent right away, only the
+    processing itself waits for a heavy job slot.
+    """
     try:
         user_id = message.from_user.id
         
-        # Initialize state for user
-        if user_id in user_states:
-            user_states[user_id].reset()
-            del user_states[user_id]
-        user_states[user_id] = PDFMerger()
-        
         # Check if command is a reply to a PDF file
         if not message.reply_to_message or not message.reply_to_message.document or \
            not message.reply_to_message.document.file_name.lower().endswith('.pdf'):
@@ -130,13 +48,46 @@ async def inverts_command(client: Client, message: Message):
             )
             return
         
+        # Resend the earlier result if this file was already processed
+        cache_key = result_key(
+            "inverts",
+            [message.reply_to_message.document.file_unique_id],
+            dark_threshold=DARK_THRESHOLD,
+            empty_ratio=EMPTY_CONTENT_RATIO
+        )
+        if await send_cached_result(message, cache_key):
+            return
+        
+        await run_heavy(message, user_id, "/inverts", lambda: inverts_document(client, message, cache_key))
+    
+    except Exception as e:
+        await message.reply_text(
+            "❌ **এরর!**\n\n"
+            f"কারণ: {str(e)}\n"
+            "দয়া করে আবার চেষ্টা করুন।"
+        )
+
+async def inverts_document(client: Client, message: Message, cache_key: str):
+    """Invert the replied PDF and drop its empty pages. Runs as a heavy job."""
+    try:
+        user_id = message.from_user.id
+        
+        # Initialize state for user
+        if user_id in user_states:
+            user_states[user_id].reset()
+            del user_states[user_id]
+        user_states[user_id] = PDFMerger()
+        
         # Create temp directory
-        temp_dir = tempfile.mkdtemp()
+        file_size = message.reply_to_message.document.file_size
+        temp_dir = create_scratch_dir(file_size * 2)
         input_path = os.path.join(temp_dir, "input.pdf")
-        inverted_path = os.path.join(temp_dir, "inverted.pdf")
         output_path = os.path.join(temp_dir, "final.pdf")
         
         try:
+            # Room for the input and the output
+            reserve_scratch(temp_dir, file_size * 2)
+            
             # Download PDF
             start_time = time.time()
             await edit_or_reply(message, user_id, "📥 **PDF ডাউনলোড করা হচ্ছে...**")
@@ -145,7 +96,8 @@ async def inverts_command(client: Client, message: Message):
             if user_id not in user_states:
                 return
                 
-            await message.reply_to_message.download(
+            await download_cached(
+                message.reply_to_message,
                 input_path,
                 progress=progress,
                 progress_args=(
@@ -160,132 +112,38 @@ async def inverts_command(client: Client, message: Message):
             if user_id not in user_states:
                 return
             
-            # Open PDF
-            doc = fitz.open(input_path)
-            out_pdf = fitz.open()
-            
-            # Copy metadata
-            out_pdf.metadata = doc.metadata
-            
-            # Process pages
-            total_pages = doc.page_count
-            inverted_count = 0
-            for page_num in range(total_pages):
-                # Check if cancelled
-                if user_id not in user_states:
-                    doc.close()
-                    out_pdf.close()
-                    return
-                
-                # Update status
-                await edit_or_reply(
-                    message, 
-                    user_id,
-                    f"🔄 **PDF প্রসেস করা হচ্ছে...**\n\n"
-                    f"• পেজ: {page_num + 1}/{total_pages}\n"
-                    f"• ইনভার্টেড: {inverted_count}টি"
-                )
-                
-                page = doc[page_num]
-                
-                # Get pixmap with optimized resolution
-                zoom = 1.0
-                mat = fitz.Matrix(zoom, zoom)
-                pix = page.get_pixmap(matrix=mat, alpha=False)
-                
-                # Convert to numpy array for faster processing
-                img_array = np.frombuffer(pix.samples, dtype=np.uint8)
-                img_array = img_array.reshape(pix.height, pix.width, 3)
-                
-                # Quick check for dark background
-                is_dark = np.mean(img_array) < 128
-                
-                if is_dark:
-                    # Fast inversion
-                    img_array = 255 - img_array
-                    inverted_count += 1
-                    
-                    # Convert to bytes
-                    img = Image.fromarray(img_array)
-                    img_bytes = io.BytesIO()
-                    img.save(img_bytes, format='JPEG', quality=85, optimize=True)
-                    
-                    # Create new page
-                    new_page = out_pdf.new_page(width=page.rect.width,
-                                              height=page.rect.height)
-                    
-                    # Insert inverted image
-                    new_page.insert_image(page.rect, 
-                                        stream=img_bytes.getvalue(),
-                                        keep_proportion=True)
-                else:
-                    # Copy original page if not dark
-                    out_pdf.insert_pdf(doc, from_page=page_num, to_page=page_num)
-            
-            # Check if cancelled
-            if user_id not in user_states:
+            # Get page count
+            document = message.reply_to_message.document
+            metadata = await get_metadata(document.file_unique_id)
+            if metadata and "page_count" in metadata:
+                total_pages = metadata["page_count"]
+            else:
+                doc = fitz.open(input_path)
+                total_pages = doc.page_count
                 doc.close()
-                out_pdf.close()
-                return
-            
-            # Save inverted PDF
-            await edit_or_reply(message, user_id, "📄 **ইনভার্টেড PDF সেভ করা হচ্ছে...**")
-            out_pdf.save(inverted_path,
-                        garbage=4,
-                        deflate=True,
-                        clean=True,
-                        linear=True)
-            
-            # Close documents
-            doc.close()
-            out_pdf.close()
-            
-            # Now remove empty pages
-            await edit_or_reply(message, user_id, "🔍 **খালি পেজ চেক করা হচ্ছে...**")
-            
-            doc = fitz.open(inverted_path)
-            out_pdf = fitz.open()
-            out_pdf.metadata = doc.metadata
-            
-            empty_pages = []
-            non_empty_count = 0
             
-            for page_num in range(doc.page_count):
-                # Check if cancelled
-                if user_id not in user_states:
-                    doc.close()
-                    out_pdf.close()
-                    return
-                
-                # Update status
-                await edit_or_reply(
-                    message,
-                    user_id,
-                    f"🔍 **খালি পেজ চেক করা হচ্ছে...**\n\n"
-                    f"• পেজ: {page_num + 1}/{doc.page_count}\n"
-                    f"• খালি পেজ: {len(empty_pages)}টি"
-                )
-                
-                page = doc[page_num]
-                analysis = analyze_page(page)
-                
-                if analysis and not analysis['is_empty']:
-                    out_pdf.insert_pdf(doc, from_page=page_num, to_page=page_num)
-                    non_empty_count += 1
-                else:
-                    empty_pages.append(page_num + 1)
+            # Invert and find empty pages in one render per page, in
+            # parallel worker processes
+            result = await invert_pages(
+                message, user_id, input_path, total_pages,
+                worker=invert_and_analyze_range,
+                dark_pages=known_dark_pages(metadata)
+            )
+            index_pdf(
+                document, cache_path(document.file_unique_id), metadata,
+                dark_pages=result['dark'], dark_threshold=DARK_THRESHOLD
+            )
+            inverted_count = len(result['inverted'])
+            empty_pages = [page_num + 1 for page_num in result['empty']]
             
-            # Save final PDF
+            # Write the final PDF directly
             await edit_or_reply(message, user_id, "📄 **ফাইনাল PDF সেভ করা হচ্ছে...**")
-            out_pdf.save(output_path,
-                        garbage=4,
-                        deflate=True,
-                        clean=True,
-                        linear=True)
-            
-            # Close documents
-            doc.close()
-            out_pdf.close()
+            await user_states[user_id].track(
+                run_in_process(
+                    assemble_pages, input_path, output_path,
+                    result['inverted'], result['empty']
+                )
+            )
             
             # Send final PDF
             start_time = time.time()
@@ -307,18 +165,20 @@ async def inverts_command(client: Client, message: Message):
             if empty_pages:
                 empty_pages_text = f"\n• খালি পেজ: {', '.join(map(str, empty_pages))}"
             
-            await message.reply_document(
+            caption = (
+                "✅ **PDF প্রসেস করা হয়েছে!**\n\n"
+                f"• অরিজিনাল ফাইল: {original_name}\n"
+                f"• মোট পেজ: {total_pages}টি\n"
+                f"• ইনভার্টেড: {inverted_count}টি\n"
+                f"• খালি পেজ রিমুভ: {len(empty_pages)}টি{empty_pages_text}\n"
+                f"• অরিজিনাল সাইজ: {orig_size:.1f} MB\n"
+                f"• নতুন সাইজ: {new_size:.1f} MB"
+            )
+            
+            sent = await message.reply_document(
                 document=output_path,
                 file_name=output_name,
-                caption=(
-                    "✅ **PDF প্রসেস করা হয়েছে!**\n\n"
-                    f"• অরিজিনাল ফাইল: {original_name}\n"
-                    f"• মোট পেজ: {total_pages}টি\n"
-                    f"• ইনভার্টেড: {inverted_count}টি\n"
-                    f"• খালি পেজ রিমুভ: {len(empty_pages)}টি{empty_pages_text}\n"
-                    f"• অরিজিনাল সাইজ: {orig_size:.1f} MB\n"
-                    f"• নতুন সাইজ: {new_size:.1f} MB"
-                ),
+                caption=caption,
                 progress=progress,
                 progress_args=(
                     message,
@@ -327,21 +187,17 @@ async def inverts_command(client: Client, message: Message):
                     start_time
                 )
             )
+            await save_result(cache_key, sent, caption)
             
+        except asyncio.CancelledError:
+            # Stopped by /allcancel
+            if user_id in user_states:
+                raise
         except Exception as e:
             raise e
         finally:
             # Clean up temp files
-            try:
-                if os.path.exists(input_path):
-                    os.remove(input_path)
-                if os.path.exists(inverted_path):
-                    os.remove(inverted_path)
-                if os.path.exists(output_path):
-                    os.remove(output_path)
-                os.rmdir(temp_dir)
-            except:
-                pass
+            release_scratch(temp_dir)
             
             # Clean up state
             if user_id in status_messages:
@@ -2,20 +2,30 @@ from pyrogram import Client, filters
 from pyrogram.types import Message
 import os
 import PyPDF2
-import tempfile
+import fitz
+import resource
 import time
 import humanize
 import asyncio
 from typing import Dict, List
 
 # Import state from state.py
-from .state import user_states, status_messages, message_locks, last_progress_update, PDFMerger
+from .state import user_states, status_messages, message_locks, last_progress_update, PDFMerger, get_job
+from .pool import run_in_process
+from .cache import download_cached, cache_path
+from .metadata import get_metadata, index_pdf
+from .results import result_key, save_result, send_cached_result
+from .scheduler import run_heavy, has_heavy_job
+from .scratch import reserve_scratch, SCRATCH_JOB_QUOTA
+from .progress import progress, edit_or_reply, replace_status, report_progress, progress_bar
 
 # Constants
 MAX_FILES = 20  # Maximum number of files
 MAX_FILE_SIZE = 60 * 1024 * 1024  # 60MB per file
 MAX_MERGED_SIZE = 1024 * 1024 * 1024  # 1GB merged file
-UPDATE_INTERVAL = 10  # Update progress every 10 seconds
+MAX_PARALLEL_DOWNLOADS = int(os.getenv('MERGE_PARALLEL_DOWNLOADS', 4))  # Concurrent downloads per merge
+MERGE_ENGINE = os.getenv('MERGE_ENGINE', 'pymupdf')  # "pymupdf" (streaming) or "pypdf2"
+MERGE_CHECKPOINT_PAGES = int(os.getenv('MERGE_CHECKPOINT_PAGES', 200))  # Pages kept in memory between saves
 
 def get_status_text(merger: PDFMerger, current=0, total=0, start_time=None, file_num=None, total_files=None, status="waiting") -> str:
     """Generate status message text."""
@@ -42,15 +52,9 @@ def get_status_text(merger: PDFMerger, current=0, total=0, start_time=None, file
         speed = current / elapsed_time if elapsed_time > 0 else 0
         eta = (total - current) / speed if speed > 0 else 0
         
-        # Generate progress bar
-        progress_bar = "".join(
-            "█" if i <= percentage / 5 else "░"
-            for i in range(20)
-        )
-        
         return (
             f"📥 **ডাউনলোড হচ্ছে: {file_num}/{total_files}**\n\n"
-            f"{progress_bar} {percentage:.1f}%\n"
+            f"{progress_bar(percentage)} {percentage:.1f}%\n"
             f"⚡ স্পীড: {humanize.naturalsize(speed)}/s\n"
             f"⏱️ বাকি সময়: {humanize.naturaltime(eta, future=True)}"
         )
@@ -65,84 +69,250 @@ async def update_status(message: Message, merger: PDFMerger, current=0, total=0,
         
         if status in ["downloading", "uploading"]:
             # For progress updates, edit existing message
-            if user_id in status_messages:
-                try:
-                    await status_messages[user_id].edit_text(status_text)
-                    return
-                except Exception as e:
-                    print(f"Failed to edit message: {str(e)}")
+            await edit_or_reply(message, user_id, status_text)
         else:
             # For status changes, delete old and create new
-            if user_id in status_messages:
-                try:
-                    await status_messages[user_id].delete()
-                except:
-                    pass
-                del status_messages[user_id]
-        
-        # Create new message if needed
-        if user_id not in status_messages:
-            status_messages[user_id] = await message.reply_text(status_text)
+            await replace_status(message, user_id, status_text)
             
     except Exception as e:
         print(f"Status update error: {str(e)}")
 
-async def progress(current: int, total: int, message: Message, text: str, start_time: float, file_num=None, total_files=None):
-    """Update progress with rate limiting."""
+def validate_pdf(file_path: str) -> int:
+    """Parse a downloaded PDF and return its page count."""
+    reader = PyPDF2.PdfReader(file_path)
+    return len(reader.pages)
+
+def memory_usage(field: str = "VmHWM") -> int:
+    """Resident memory of the current process in bytes.
+
+    field is "VmRSS" for the current size or "VmHWM" for the peak. Falls
+    back to the peak from getrusage where /proc isn't available.
+    """
     try:
-        user_id = message.from_user.id
-        now = time.time()
-        
-        # Update only if enough time has passed
-        if user_id in user_states and (user_id not in last_progress_update or (now - last_progress_update.get(user_id, 0)) >= UPDATE_INTERVAL):
-            last_progress_update[user_id] = now
-            
-            # Calculate progress
-            percentage = (current * 100) / total if total > 0 else 0
-            elapsed_time = time.time() - start_time if start_time else 0
-            speed = current / elapsed_time if elapsed_time > 0 else 0
-            eta = (total - current) / speed if speed > 0 else 0
-            
-            # Generate progress bar
-            progress_bar = "".join(
-                "█" if i <= percentage / 5 else "░"
-                for i in range(20)
-            )
-            
-            if text == "Downloading":
-                status_text = (
-                    f"📥 **ডাউনলোড হচ্ছে: {file_num}/{total_files}**\n\n"
-                    f"{progress_bar} {percentage:.1f}%\n"
-                    f"⚡ স্পীড: {humanize.naturalsize(speed)}/s\n"
-                    f"⏱️ বাকি সময়: {humanize.naturaltime(eta, future=True)}"
-                )
-            else:
-                status_text = (
-                    "📤 **আপলোড হচ্ছে**\n\n"
-                    f"{progress_bar} {percentage:.1f}%\n"
-                    f"⚡ স্পীড: {humanize.naturalsize(speed)}/s\n"
-                    f"⏱️ বাকি সময়: {humanize.naturaltime(eta, future=True)}"
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def reset_peak_memory():
+    """Start measuring peak memory from now.
+
+    A forked worker inherits the bot's peak, so clear it first (Linux only).
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+def merge_files_pypdf2(pdf_files: List[str], output_path: str):
+    """Merge with PyPDF2, which keeps every input in memory until write()."""
+    merger_pdf = PyPDF2.PdfMerger()
+    for pdf_file in pdf_files:
+        try:
+            merger_pdf.append(pdf_file)
+        except Exception as e:
+            raise Exception(f"PDF মার্জ করতে সমস্যা: {str(e)}")
+    
+    merger_pdf.write(output_path)
+    merger_pdf.close()
+
+def merge_files_streaming(pdf_files: List[str], output_path: str):
+    """Merge with PyMuPDF, saving incrementally to keep memory bounded.
+
+    Every MERGE_CHECKPOINT_PAGES pages the output is flushed to disk and
+    reopened, so only the pages added since the last save stay in memory.
+    Bookmarks of every input are kept, pointing at their pages in the
+    output.
+    """
+    out_pdf = fitz.open()
+    saved = False
+    pending_pages = 0
+    total_pages = 0
+    toc = []
+    
+    for i, pdf_file in enumerate(pdf_files):
+        try:
+            with fitz.open(pdf_file) as src:
+                out_pdf.insert_pdf(src)
+                pending_pages += src.page_count
+                # Bookmarks without a target page (-1) stay without one
+                toc.extend(
+                    [level, title, page + total_pages if page > 0 else page]
+                    for level, title, page in src.get_toc()
                 )
-            
-            # Update status message
-            if user_id in status_messages:
-                try:
-                    await status_messages[user_id].edit_text(status_text)
-                except Exception as e:
-                    print(f"Failed to update progress: {str(e)}")
-            
-    except Exception as e:
-        print(f"Progress update error: {str(e)}")
+                total_pages += src.page_count
+        except Exception as e:
+            raise Exception(f"PDF মার্জ করতে সমস্যা: {str(e)}")
+        
+        is_last = i == len(pdf_files) - 1
+        if pending_pages < MERGE_CHECKPOINT_PAGES and not is_last:
+            continue
+        
+        if is_last and toc:
+            try:
+                out_pdf.set_toc(toc)
+            except Exception as e:
+                print(f"Bookmark error: {str(e)}")
+        
+        # Flush what we have and drop it from memory
+        if saved:
+            out_pdf.saveIncr()
+        else:
+            out_pdf.save(output_path, garbage=1, deflate=True)
+            saved = True
+        out_pdf.close()
+        fitz.TOOLS.store_shrink(100)
+        pending_pages = 0
+        
+        if not is_last:
+            out_pdf = fitz.open(output_path)
+
+def merge_files(pdf_files: List[str], output_path: str) -> int:
+    """Merge PDF files into output_path (runs in a worker process).
+
+    Returns how far the worker's memory grew above what it started with
+    (the pages it shares with the bot after the fork), in bytes.
+    """
+    start = time.time()
+    reset_peak_memory()
+    start_memory = memory_usage("VmRSS")
+    if MERGE_ENGINE == "pypdf2":
+        merge_files_pypdf2(pdf_files, output_path)
+    else:
+        merge_files_streaming(pdf_files, output_path)
+    
+    peak = max(0, memory_usage() - start_memory)
+    print(
+        f"Merge ({MERGE_ENGINE}): {len(pdf_files)} files in {time.time() - start:.1f}s, "
+        f"peak memory +{humanize.naturalsize(peak)}"
+    )
+    return peak
+
+async def download_pdf(message: Message, merger: PDFMerger, user_id: int, file_num: int, pdf: Dict):
+    """Download and validate one queued PDF in the background."""
+    file_path = os.path.join(merger.temp_dir, f"pdf_{file_num}.pdf")
+    
+    async def on_progress(current: int, total: int):
+        merger.download_progress[file_num] = current
+        
+        # Only report once every file has arrived, the status message
+        # shows the received/remaining count until then
+        if merger.collecting:
+            return
+        
+        report_progress(message, user_id, get_status_text(
+            merger,
+            sum(merger.download_progress.values()),
+            sum(f['size'] for f in merger.pdf_files),
+            merger.download_start,
+            sum(1 for f in merger.pdf_files if 'path' in f),
+            merger.required_files,
+            status="downloading"
+        ))
+    
+    async with merger.download_semaphore:
+        # Check if operation was cancelled
+        if user_id not in user_states:
+            return
+        
+        if merger.download_start is None:
+            merger.download_start = time.time()
+        
+        try:
+            await download_cached(pdf['message'], file_path, progress=on_progress)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            raise Exception(f"ফাইল ডাউনলোড করতে সমস্যা ({pdf['name']}): {str(e)}")
+        
+        # Check if operation was cancelled
+        if user_id not in user_states:
+            return
+    
+    merger.download_progress[file_num] = pdf['size']
+    
+    # Files opened before don't need to be validated again
+    document = pdf['message'].document
+    metadata = await get_metadata(document.file_unique_id)
+    if metadata and "page_count" in metadata:
+        pdf['pages'] = metadata["page_count"]
+    else:
+        # Validate while the remaining files are still arriving
+        try:
+            pdf['pages'] = await asyncio.get_running_loop().run_in_executor(None, validate_pdf, file_path)
+        except Exception as e:
+            raise Exception(f"সঠিক PDF ফাইল নয় ({pdf['name']}): {str(e)}")
+        index_pdf(document, cache_path(document.file_unique_id), metadata, page_count=pdf['pages'])
+    
+    pdf['path'] = file_path
+
+async def abort_merge(message: Message, user_id: int, reason: str):
+    """Report a failed background download and drop the merge."""
+    # Unlink the state first so the other transfers stop at their next check
+    merger = user_states.pop(user_id, None)
+    
+    if user_id in status_messages:
+        try:
+            await status_messages[user_id].delete()
+        except:
+            pass
+        del status_messages[user_id]
+    
+    await message.reply_text(
+        "❌ **এরর!**\n\n"
+        f"কারণ: {reason}\n"
+        "দয়া করে আবার চেষ্টা করুন।"
+    )
+    
+    if merger:
+        merger.reset()
+
+async def queue_download(message: Message, merger: PDFMerger, user_id: int, pdf: Dict):
+    """Start downloading a PDF as soon as it has been queued."""
+    file_num = len(merger.pdf_files)
+    
+    async def run():
+        try:
+            await download_pdf(message, merger, user_id, file_num, pdf)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"PDF download error: {str(e)}")
+            if user_states.get(user_id) is merger:
+                await abort_merge(message, user_id, str(e))
+    
+    pdf['task'] = asyncio.create_task(run())
+    merger.tasks.append(pdf['task'])
+
+async def wait_for_downloads(merger: PDFMerger, user_id: int) -> bool:
+    """Wait for the background downloads of all queued PDFs.
+
+    Returns False if the merge was cancelled or a download failed.
+    """
+    await asyncio.gather(
+        *(pdf['task'] for pdf in merger.pdf_files),
+        return_exceptions=True
+    )
+    
+    if user_states.get(user_id) is not merger or any('path' not in pdf for pdf in merger.pdf_files):
+        return False
+    
+    merger.downloaded_files.extend(pdf['path'] for pdf in merger.pdf_files)
+    return True
 
 async def merge_command(client: Client, message: Message):
     """Handle /merge command."""
     try:
         user_id = message.from_user.id
         
-        # Check if user has an active download
-        current_time = time.time()
-        if user_id in last_progress_update and (current_time - last_progress_update[user_id]) < UPDATE_INTERVAL:
-            await message.reply_text("❌ একটি মার্জ টাস্ক চলমান আছে। দয়া করে এটি শেষ হওয়ার অপেক্ষা করুন অথবা /allcancel দিয়ে বাতিল করুন।")
+        # The merge needs the user's heavy job slot once the files are in,
+        # so don't collect files while another job holds it
+        if has_heavy_job(user_id):
+            await message.reply_text("❌ একটি টাস্ক চলমান আছে। দয়া করে এটি শেষ হওয়ার অপেক্ষা করুন অথবা /allcancel দিয়ে বাতিল করুন।")
             return
         
         # Get number of PDFs to merge
@@ -178,6 +348,12 @@ async def merge_command(client: Client, message: Message):
             await message.reply_text(f"❌ সর্বোচ্চ {MAX_FILES}টি PDF ফাইল একত্রিত করা যাবে।")
             return
         
+        # The inputs and the merged file must fit in the job's scratch quota
+        max_files = (SCRATCH_JOB_QUOTA - MAX_MERGED_SIZE) // MAX_FILE_SIZE
+        if num_pdfs > max_files:
+            await message.reply_text(f"❌ এই সার্ভারে সর্বোচ্চ {max(max_files, 0)}টি PDF ফাইল একত্রিত করা যাবে।")
+            return
+        
         # Initialize merger for user
         user_id = message.from_user.id
         if user_id in user_states:
@@ -187,6 +363,7 @@ async def merge_command(client: Client, message: Message):
         merger = user_states[user_id]
         merger.required_files = num_pdfs
         merger.collecting = True
+        merger.download_semaphore = asyncio.Semaphore(MAX_PARALLEL_DOWNLOADS)
         
         await message.reply_text(
             f"📥 **{num_pdfs}টি PDF ফাইল পাঠান**\n\n"
@@ -197,6 +374,133 @@ async def merge_command(client: Client, message: Message):
     except ValueError:
         await message.reply_text("❌ অনুগ্রহ করে একটি বৈধ সংখ্যা দিন।")
 
+async def finish_merge(user_id: int, merger: PDFMerger):
+    """Clean up after a merge is done."""
+    if user_id in status_messages:
+        try:
+            await status_messages[user_id].delete()
+        except:
+            pass
+        del status_messages[user_id]
+    if user_id in message_locks:
+        del message_locks[user_id]
+    if user_id in last_progress_update:
+        del last_progress_update[user_id]
+    if user_id in user_states:
+        merger.reset()
+
+async def merge_stage(message: Message, merger: PDFMerger, user_id: int, cache_key: str):
+    """Merge the received PDFs and send the result."""
+    try:
+        # Wait for the background downloads
+        total_size = sum(f['size'] for f in merger.pdf_files)
+        
+        if not await wait_for_downloads(merger, user_id):
+            return
+        
+        # Check if operation was cancelled
+        if user_id not in user_states:
+            return
+        
+        # Room for the merged file
+        reserve_scratch(merger.temp_dir, min(total_size, MAX_MERGED_SIZE))
+        
+        # Merge PDFs
+        await update_status(message, merger, status="merging")
+        merge_start = time.time()
+        
+        output_path = os.path.join(merger.temp_dir, "merged.pdf")
+        temp_output = f"{output_path}.temp"
+        
+        # Check if operation was cancelled
+        if user_id not in user_states:
+            return
+        
+        # Merge to temp file first, in a worker process so the
+        # event loop stays responsive
+        merger.merge_task = asyncio.create_task(
+            run_in_process(merge_files, list(merger.downloaded_files), temp_output)
+        )
+        try:
+            await merger.merge_task
+        except asyncio.CancelledError:
+            if os.path.exists(temp_output):
+                os.remove(temp_output)
+            if user_id not in user_states:
+                return
+            raise
+        
+        # Check if operation was cancelled
+        if user_id not in user_states:
+            if os.path.exists(temp_output):
+                os.remove(temp_output)
+            return
+        
+        # Move merged file to final location
+        os.replace(temp_output, output_path)
+        
+        merge_time = time.time() - merge_start
+        
+        # Check merged file size
+        if os.path.getsize(output_path) > MAX_MERGED_SIZE:
+            await update_status(
+                message,
+                merger,
+                status=f"❌ একত্রিত ফাইলের সাইজ {humanize.naturalsize(MAX_MERGED_SIZE)} এর বেশি হতে পারবে না।"
+            )
+            merger.reset()
+            return
+        
+        # Check if operation was cancelled
+        if user_id not in user_states:
+            return
+        
+        # Send merged file
+        await update_status(message, merger, status="uploading")
+        
+        upload_start = time.time()
+        # Create file list with serial numbers
+        file_list = "\n".join([f"{i}. {pdf['name']}" for i, pdf in enumerate(merger.pdf_files, 1)])
+        
+        # Check if operation was cancelled
+        if user_id not in user_states:
+            return
+        
+        caption = (
+            "✅ PDF ফাইল একত্রিত করা হয়েছে!\n\n"
+            f"{file_list}\n\n"
+            f"• মোট ফাইল: {len(merger.downloaded_files)}টি\n"
+            f"• মোট পেজ: {sum(pdf['pages'] for pdf in merger.pdf_files)}টি\n"
+            f"• মোট সাইজ: {humanize.naturalsize(total_size)}\n"
+            f"• প্রসেস টাইম: {merge_time:.1f}s"
+        )
+        
+        sent = await message.reply_document(
+            document=output_path,
+            caption=caption,
+            progress=progress,
+            progress_args=(
+                message,
+                user_id,
+                "📤 **একত্রিত PDF ফাইল পাঠানো হচ্ছে...**",
+                upload_start
+            )
+        )
+        await save_result(cache_key, sent, caption)
+        
+    except Exception as e:
+        print(f"PDF merge error: {str(e)}")
+        if user_id in user_states:
+            user_states[user_id].reset()
+            del user_states[user_id]
+        await message.reply_text(
+            "❌ **এরর!**\n\n"
+            f"কারণ: {str(e)}\n"
+            "দয়া করে আবার চেষ্টা করুন।"
+        )
+    finally:
+        await finish_merge(user_id, merger)
+
 async def handle_pdf(client: Client, message: Message):
     """Handle incoming PDF files."""
     try:
@@ -207,6 +511,9 @@ async def handle_pdf(client: Client, message: Message):
         
         merger = user_states[user_id]
         
+        # Keep the job alive while files keep arriving
+        get_job(user_id)
+        
         # Check if it's a PDF file
         if not message.document or not message.document.file_name.lower().endswith('.pdf'):
             await message.reply_text("❌ দয়া করে একটি PDF ফাইল পাঠান।")
@@ -218,6 +525,9 @@ async def handle_pdf(client: Client, message: Message):
             )
             return
         
+        # Make sure there is room for the file before it downloads
+        reserve_scratch(merger.temp_dir, message.document.file_size)
+        
         # Get or create lock for this user
         if user_id not in message_locks:
             message_locks[user_id] = asyncio.Lock()
@@ -225,11 +535,15 @@ async def handle_pdf(client: Client, message: Message):
         # Process file under lock
         async with message_locks[user_id]:
             # Add file to queue
-            merger.pdf_files.append({
+            pdf = {
                 'message': message,
                 'name': message.document.file_name,
                 'size': message.document.file_size
-            })
+            }
+            merger.pdf_files.append(pdf)
+            
+            # Start downloading right away
+            await queue_download(message, merger, user_id, pdf)
             
             # Update status message
             await update_status(message, merger)
@@ -238,151 +552,19 @@ async def handle_pdf(client: Client, message: Message):
             if len(merger.pdf_files) == merger.required_files:
                 merger.collecting = False
                 
-                try:
-                    # Download all PDFs
-                    total_size = sum(f['size'] for f in merger.pdf_files)
-                    
-                    for i, pdf in enumerate(merger.pdf_files, 1):
-                        # Check if operation was cancelled
-                        if user_id not in user_states:
-                            return
-                            
-                        file_path = os.path.join(merger.temp_dir, f"pdf_{i}.pdf")
-                        temp_path = f"{file_path}.temp"
-                        
-                        # Download to temp file first
-                        await pdf['message'].download(
-                            temp_path,
-                            progress=progress,
-                            progress_args=(
-                                message,
-                                "Downloading",
-                                time.time(),
-                                i,
-                                merger.required_files
-                            )
-                        )
-                        
-                        # Check if operation was cancelled
-                        if user_id not in user_states:
-                            if os.path.exists(temp_path):
-                                os.remove(temp_path)
-                            return
-                        
-                        # Move temp file to final location
-                        try:
-                            os.replace(temp_path, file_path)
-                            merger.downloaded_files.append(file_path)
-                        except Exception as e:
-                            if os.path.exists(temp_path):
-                                os.remove(temp_path)
-                            raise Exception(f"ফাইল মুভ করতে সমস্যা: {str(e)}")
-                    
-                    # Check if operation was cancelled
-                    if user_id not in user_states:
-                        return
-                    
-                    # Merge PDFs
-                    await update_status(message, merger, status="merging")
-                    merge_start = time.time()
-                    
-                    output_path = os.path.join(merger.temp_dir, "merged.pdf")
-                    temp_output = f"{output_path}.temp"
-                    
-                    # Check if operation was cancelled
-                    if user_id not in user_states:
-                        return
-                    
-                    # Merge to temp file first
-                    merger_pdf = PyPDF2.PdfMerger()
-                    for pdf_file in merger.downloaded_files:
-                        # Check if operation was cancelled
-                        if user_id not in user_states:
-                            if os.path.exists(temp_output):
-                                os.remove(temp_output)
-                            return
-                            
-                        try:
-                            merger_pdf.append(pdf_file)
-                        except Exception as e:
-                            raise Exception(f"PDF মার্জ করতে সমস্যা: {str(e)}")
-                    
-                    # Check if operation was cancelled
-                    if user_id not in user_states:
-                        if os.path.exists(temp_output):
-                            os.remove(temp_output)
-                        return
-                    
-                    merger_pdf.write(temp_output)
-                    merger_pdf.close()
-                    
-                    # Check if operation was cancelled
-                    if user_id not in user_states:
-                        if os.path.exists(temp_output):
-                            os.remove(temp_output)
-                        return
-                    
-                    # Move merged file to final location
-                    os.replace(temp_output, output_path)
-                    
-                    merge_time = time.time() - merge_start
-                    
-                    # Check merged file size
-                    if os.path.getsize(output_path) > MAX_MERGED_SIZE:
-                        await update_status(
-                            message,
-                            merger,
-                            status=f"❌ একত্রিত ফাইলের সাইজ {humanize.naturalsize(MAX_MERGED_SIZE)} এর বেশি হতে পারবে না।"
-                        )
-                        merger.reset()
-                        return
-                    
-                    # Check if operation was cancelled
-                    if user_id not in user_states:
-                        return
-                    
-                    # Send merged file
-                    await update_status(message, merger, status="uploading")
-                    
-                    upload_start = time.time()
-                    # Create file list with serial numbers
-                    file_list = "\n".join([f"{i}. {pdf['name']}" for i, pdf in enumerate(merger.pdf_files, 1)])
-                    
-                    # Check if operation was cancelled
-                    if user_id not in user_states:
-                        return
-                    
-                    await message.reply_document(
-                        document=output_path,
-                        caption=(
-                            "✅ PDF ফাইল একত্রিত করা হয়েছে!\n\n"
-                            f"{file_list}\n\n"
-                            f"• মোট ফাইল: {len(merger.downloaded_files)}টি\n"
-                            f"• মোট সাইজ: {humanize.naturalsize(total_size)}\n"
-                            f"• প্রসেস টাইম: {merge_time:.1f}s"
-                        ),
-                        progress=progress,
-                        progress_args=(
-                            message,
-                            "Uploading",
-                            upload_start
-                        )
-                    )
-                    
-                except Exception as e:
-                    raise e
-                finally:
-                    # Clean up
-                    if user_id in status_messages:
-                        try:
-                            await status_messages[user_id].delete()
-                        except:
-                            pass
-                        del status_messages[user_id]
-                    if user_id in message_locks:
-                        del message_locks[user_id]
-                    if user_id in user_states:
-                        merger.reset()
+                # Resend the earlier result if these files were already merged
+                cache_key = result_key(
+                    "merge",
+                    [pdf['message'].document.file_unique_id for pdf in merger.pdf_files],
+                    engine=MERGE_ENGINE
+                )
+                if await send_cached_result(message, cache_key):
+                    await finish_merge(user_id, merger)
+                    return
+                
+                # Merging is a heavy job; wait for a free slot
+                if not await run_heavy(message, user_id, "/merge", lambda: merge_stage(message, merger, user_id, cache_key)):
+                    await finish_merge(user_id, merger)
         
     except Exception as e:
         print(f"PDF handling error: {str(e)}")
@@ -0,0 +1,92 @@
+from pyrogram.types import Document
+from motor.motor_asyncio import AsyncIOMotorClient
+from datetime import datetime
+from typing import Dict, Optional
+import asyncio
+import os
+import fitz
+from dotenv import load_dotenv
+
+from .pool import run_in_thread
+from .render import DARK_THRESHOLD
+
+# Load environment variables
+load_dotenv()
+
+# MongoDB setup
+mongo_client = AsyncIOMotorClient(os.getenv('MONGODB_URI'))
+db = mongo_client[os.getenv('DB_NAME')]
+metadata_collection = db['pdf_metadata']
+
+# Facts about PDF documents, keyed by Telegram file_unique_id:
+#   file_name, file_size, page_count
+#   page_sizes     [[width, height], ...] in points
+#   dark_pages     pages darker than dark_threshold, saved by /invert and /inverts
+#   scanned_pages  pages with images but no text or drawings, the rest are
+#                  vector; saved by /invert vector
+#   preview_file_id  Telegram photo of page 1 sent by /pages
+
+async def get_metadata(file_unique_id: str) -> Optional[Dict]:
+    """Look up what is known about a document."""
+    try:
+        return await metadata_collection.find_one({"_id": file_unique_id})
+    except Exception as e:
+        print(f"Error reading metadata: {str(e)}")
+        return None
+
+async def save_metadata(document: Document, **fields):
+    """Store facts about a document, keeping the ones already known."""
+    try:
+        await metadata_collection.update_one(
+            {"_id": document.file_unique_id},
+            {"$set": {
+                "file_name": document.file_name,
+                "file_size": document.file_size,
+                "updated_at": datetime.utcnow(),
+                **fields
+            }},
+            upsert=True
+        )
+    except Exception as e:
+        print(f"Error saving metadata: {str(e)}")
+
+def describe_pdf(path: str) -> Dict:
+    """Read page count and page sizes of a PDF.
+
+    Only the page tree is read, no page content is parsed, so this is cheap
+    enough to run in a thread without taking a worker process from jobs.
+    """
+    doc = fitz.open(path)
+    try:
+        return {
+            "page_count": doc.page_count,
+            "page_sizes": [[round(page.rect.width, 1), round(page.rect.height, 1)] for page in doc],
+        }
+    finally:
+        doc.close()
+
+async def _index_pdf(document: Document, path: str, fields: Dict):
+    try:
+        fields = {**await run_in_thread(describe_pdf, path), **fields}
+    except Exception as e:
+        print(f"Error indexing PDF: {str(e)}")
+    await save_metadata(document, **fields)
+
+def index_pdf(document: Document, path: str, metadata: Optional[Dict], **fields) -> Optional[asyncio.Task]:
+    """Record a downloaded PDF in the index in the background.
+
+    Page facts are read from path in a thread unless metadata
+    already has them. path must outlive the task, so pass the document
+    cache path rather than a job's temp file.
+    """
+    if metadata and "page_sizes" in metadata:
+        if fields:
+            return asyncio.create_task(save_metadata(document, **fields))
+        return None
+    return asyncio.create_task(_index_pdf(document, path, fields))
+
+def known_dark_pages(metadata: Optional[Dict]):
+    """Dark pages from the index, if they were found with the current threshold."""
+    if metadata and metadata.get("dark_threshold") == DARK_THRESHOLD and "dark_pages" in metadata:
+        return set(metadata["dark_pages"])
+    return None
@@ -1,143 +1,290 @@
 from pyrogram import Client, filters
 from pyrogram.types import Message
 import os
-import tempfile
 import fitz
 import time
-from PIL import Image
+import asyncio
+from PIL import Image, ImageDraw
 import io
+from typing import Dict, List, Optional
 
 # Import helpers
-from .state import status_messages, user_states, PDFMerger, last_progress_update
-from .progress import progress, edit_or_reply
+from .progress import StatusMessage
+from .cache import download_cached, cache_path
+from .pdfrange import read_first_page, read_page_count
+from .metadata import get_metadata, save_metadata, index_pdf
+from .scratch import create_scratch_dir, reserve_scratch, free_scratch, release_scratch
+
+# Batch mode settings
+MAX_PARALLEL_FILES = int(os.getenv('PAGES_PARALLEL_FILES', 4))  # Files inspected at once
+SHEET_COLUMNS = 5  # Thumbnails per row on the preview sheet
+SHEET_THUMB_WIDTH = 200
+
+def is_pdf(message: Optional[Message]) -> bool:
+    """Check if a message carries a PDF document."""
+    return bool(
+        message and message.document and message.document.file_name
+        and message.document.file_name.lower().endswith('.pdf')
+    )
+
+async def get_pdf_messages(client: Client, message: Message) -> List[Message]:
+    """PDF documents a command refers to.
+
+    That is the replied document (or the document the command is the
+    caption of), or every PDF in its media group.
+    """
+    target = message.reply_to_message if message.reply_to_message else message
+    if not target.media_group_id:
+        return [target] if is_pdf(target) else []
+    
+    group = await client.get_media_group(target.chat.id, target.id)
+    return [item for item in group if is_pdf(item)]
+
+def pix_to_image(pix: fitz.Pixmap) -> Image.Image:
+    """Convert a rendered page to a PIL image."""
+    return Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+
+async def inspect_pdf(client: Client, pdf_message: Message, temp_dir: str, preview: bool = True, status: StatusMessage = None) -> Dict:
+    """Get a PDF's page count and (optionally) a page 1 preview.
+
+    Tries the cheapest source first: the metadata index, then range reads
+    of the document, then a full download, shown in status if given.
+    Returns {'pages', 'image'}, where image is a PIL image or None.
+    """
+    document = pdf_message.document
+    metadata = await get_metadata(document.file_unique_id)
+    known_pages = metadata.get("page_count") if metadata else None
+    
+    if known_pages and not preview:
+        return {'pages': known_pages, 'image': None}
+    if known_pages and metadata.get("preview_file_id"):
+        try:
+            photo = await client.download_media(metadata["preview_file_id"], in_memory=True)
+            return {'pages': known_pages, 'image': Image.open(photo).convert("RGB")}
+        except Exception as e:
+            print(f"Cached preview download error: {str(e)}")
+    
+    # Read only the parts of the file that are needed, unless the whole
+    # file is already cached
+    if not os.path.exists(cache_path(document.file_unique_id)):
+        try:
+            if preview:
+                total_pages, pix = await read_first_page(client, pdf_message)
+                image = pix_to_image(pix)
+            else:
+                total_pages, image = await read_page_count(client, pdf_message), None
+            if not known_pages:
+                await save_metadata(document, page_count=total_pages)
+            return {'pages': total_pages, 'image': image}
+        except Exception as e:
+            print(f"Range read failed, downloading instead: {str(e)}")
+    
+    # Download PDF
+    input_path = os.path.join(temp_dir, f"{document.file_unique_id}.pdf")
+    reserve_scratch(temp_dir, document.file_size)
+    try:
+        if status:
+            text = "📥 **PDF ডাউনলোড করা হচ্ছে...**"
+            await status.show(text)
+            await download_cached(pdf_message, input_path, progress=status.progress, progress_args=(text, time.time()))
+        else:
+            await download_cached(pdf_message, input_path)
+        
+        # Get PDF info and first page preview
+        doc = fitz.open(input_path)
+        total_pages = doc.page_count
+        image = pix_to_image(doc[0].get_pixmap(matrix=fitz.Matrix(0.5, 0.5))) if preview else None
+        doc.close()
+    finally:
+        if os.path.exists(input_path):
+            os.remove(input_path)
+        free_scratch(temp_dir, document.file_size)
+    
+    index_pdf(document, cache_path(document.file_unique_id), metadata, page_count=total_pages)
+    return {'pages': total_pages, 'image': image}
+
+def pages_caption(document, total_pages: int) -> str:
+    """Caption of the /pages preview."""
+    file_size = document.file_size / (1024 * 1024)  # MB
+    return (
+        "📄 **PDF তথ্য**\n\n"
+        f"**📋 নাম:** {document.file_name}\n"
+        f"**📚 মোট পেজ:** {total_pages}টি\n"
+        f"**📦 ফাইল সাইজ:** {file_size:.1f} MB\n\n"
+        "**🔍 প্রিভিউ:** প্রথম পেজ"
+    )
+
+def build_preview_sheet(images: List[Optional[Image.Image]]) -> io.BytesIO:
+    """Lay out numbered page 1 thumbnails in a grid, as a JPEG."""
+    thumbs = []
+    for image in images:
+        if image is None:
+            image = Image.new("RGB", (SHEET_THUMB_WIDTH, int(SHEET_THUMB_WIDTH * 1.414)), (230, 230, 230))
+        thumb = image.copy()
+        thumb.thumbnail((SHEET_THUMB_WIDTH, SHEET_THUMB_WIDTH * 2))
+        thumbs.append(thumb)
+    
+    gap = 10
+    columns = min(SHEET_COLUMNS, len(thumbs))
+    rows = (len(thumbs) + columns - 1) // columns
+    cell_height = max(thumb.height for thumb in thumbs)
+    sheet = Image.new(
+        "RGB",
+        (columns * (SHEET_THUMB_WIDTH + gap) + gap, rows * (cell_height + gap) + gap),
+        (255, 255, 255)
+    )
+    draw = ImageDraw.Draw(sheet)
+    
+    for i, thumb in enumerate(thumbs):
+        x = gap + (i % columns) * (SHEET_THUMB_WIDTH + gap)
+        y = gap + (i // columns) * (cell_height + gap)
+        sheet.paste(thumb, (x, y))
+        draw.rectangle([x, y, x + thumb.width - 1, y + thumb.height - 1], outline=(180, 180, 180))
+        draw.rectangle([x, y, x + 28, y + 18], fill=(0, 0, 0))
+        draw.text((x + 5, y + 3), str(i + 1), fill=(255, 255, 255))
+    
+    out = io.BytesIO()
+    sheet.save(out, format='JPEG', quality=85, optimize=True)
+    out.seek(0)
+    return out
+
+def short_name(name: str, limit: int = 40) -> str:
+    """Shorten a file name for list output."""
+    return name if len(name) <= limit else name[:limit - 1] + "…"
+
+async def pages_batch(client: Client, message: Message, status: StatusMessage, pdf_messages: List[Message], temp_dir: str):
+    """Inspect several PDFs concurrently and send one summary."""
+    results: List[Optional[Dict]] = [None] * len(pdf_messages)
+    errors: Dict[int, str] = {}
+    semaphore = asyncio.Semaphore(MAX_PARALLEL_FILES)
+    
+    def file_lines() -> str:
+        lines = []
+        for i, pdf_message in enumerate(pdf_messages):
+            name = short_name(pdf_message.document.file_name)
+            if results[i]:
+                lines.append(f"{i + 1}. {name} - {results[i]['pages']}টি পেজ")
+            elif i in errors:
+                lines.append(f"{i + 1}. {name} - ❌ {errors[i]}")
+            else:
+                lines.append(f"{i + 1}. {name} - ⏳")
+        return "\n".join(lines)
+    
+    async def inspect(i: int):
+        async with semaphore:
+            try:
+                results[i] = await inspect_pdf(client, pdf_messages[i], temp_dir)
+            except Exception as e:
+                errors[i] = str(e)
+    
+    tasks = [asyncio.create_task(inspect(i)) for i in range(len(pdf_messages))]
+    try:
+        done = 0
+        for next_done in asyncio.as_completed(tasks):
+            await next_done
+            done += 1
+            
+            # Show results as files finish; updates are coalesced
+            if done < len(tasks):
+                status.report(f"🔍 **PDF চেক করা হচ্ছে... ({done}/{len(tasks)})**\n\n{file_lines()}")
+    finally:
+        # Stop the other files when cancelled
+        for task in tasks:
+            task.cancel()
+    
+    total_pages = sum(result['pages'] for result in results if result)
+    summary = (
+        "📄 **PDF তথ্য**\n\n"
+        f"{file_lines()}\n\n"
+        f"**📁 মোট ফাইল:** {len(pdf_messages)}টি\n"
+        f"**📚 মোট পেজ:** {total_pages}টি"
+    )
+    if errors:
+        summary += f"\n**❌ পড়া যায়নি:** {len(errors)}টি ফাইল"
+    
+    await message.reply_photo(
+        photo=build_preview_sheet([result['image'] if result else None for result in results]),
+        caption=(
+            f"**📁 মোট ফাইল:** {len(pdf_messages)}টি\n"
+            f"**📚 মোট পেজ:** {total_pages}টি\n\n"
+            "**🔍 প্রিভিউ:** প্রতিটি ফাইলের প্রথম পেজ"
+        )
+    )
+    await message.reply_text(summary)
 
 async def pages_command(client: Client, message: Message):
     """Handle /pages command to show PDF info and first page preview."""
     try:
-        user_id = message.from_user.id
-        
-        # Check if command is a reply to a PDF file
-        if not message.reply_to_message or not message.reply_to_message.document or \
-           not message.reply_to_message.document.file_name.lower().endswith('.pdf'):
+        # PDFs from the replied message or its media group
+        pdf_messages = await get_pdf_messages(client, message)
+        if not pdf_messages:
             await message.reply_text(
                 "❌ **দয়া করে একটি PDF ফাইলে রিপ্লাই দিয়ে /pages কমান্ড দিন।**\n\n"
                 "**🔍 তথ্য পাবেন:**\n"
                 "• PDF এর নাম\n"
                 "• মোট পেজ সংখ্যা\n"
-                "• প্রথম পেজের প্রিভিউ"
+                "• প্রথম পেজের প্রিভিউ\n\n"
+                "**📚 একসাথে অনেক PDF:**\n"
+                "• একসাথে পাঠানো (অ্যালবাম) যেকোনো একটি PDF এ রিপ্লাই দিন\n"
+                "• সব ফাইলের পেজ, মোট পেজ ও প্রিভিউ একসাথে পাবেন"
             )
             return
-            
-        # Initialize state
-        if user_id in user_states:
-            if user_id in status_messages:
+        
+        # Answer from the metadata index when the file was seen before
+        document = pdf_messages[0].document
+        if len(pdf_messages) == 1:
+            metadata = await get_metadata(document.file_unique_id)
+            if metadata and metadata.get("preview_file_id") and "page_count" in metadata:
                 try:
-                    await status_messages[user_id].delete()
-                except:
-                    pass
-                del status_messages[user_id]
-            user_states[user_id].reset()
-            del user_states[user_id]
-            
-        user_states[user_id] = PDFMerger()
+                    await message.reply_photo(
+                        photo=metadata["preview_file_id"],
+                        caption=pages_caption(document, metadata["page_count"])
+                    )
+                    return
+                except Exception as e:
+                    print(f"Cached preview send error: {str(e)}")
+        
+        # /pages runs next to the user's heavy job, so it keeps its own
+        # status message and leaves the job's state alone
+        status = StatusMessage(message)
         
         # Create temp directory
-        temp_dir = tempfile.mkdtemp()
-        input_path = os.path.join(temp_dir, "input.pdf")
-        preview_path = os.path.join(temp_dir, "preview.jpg")
+        temp_dir = create_scratch_dir()
         
         try:
-            # Download PDF
-            start_time = time.time()
-            await edit_or_reply(message, user_id, "📥 **PDF ডাউনলোড করা হচ্ছে...**")
-            
-            await message.reply_to_message.download(
-                input_path,
-                progress=progress,
-                progress_args=(
-                    message,
-                    user_id,
-                    "📥 **PDF ডাউনলোড করা হচ্ছে...**",
-                    start_time
-                )
-            )
-            
-            # Get PDF info
-            doc = fitz.open(input_path)
-            total_pages = doc.page_count
+            if len(pdf_messages) > 1:
+                await status.show(f"🔍 **{len(pdf_messages)}টি PDF চেক করা হচ্ছে...**")
+                await pages_batch(client, message, status, pdf_messages, temp_dir)
+                return
             
-            # Get first page preview
-            first_page = doc[0]
-            pix = first_page.get_pixmap(matrix=fitz.Matrix(0.5, 0.5))
+            result = await inspect_pdf(client, pdf_messages[0], temp_dir, status=status)
             
-            # Convert to PIL and optimize
-            img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+            # Optimize preview
             img_bytes = io.BytesIO()
-            img.save(img_bytes, format='JPEG', quality=85, optimize=True)
+            result['image'].save(img_bytes, format='JPEG', quality=85, optimize=True)
             img_bytes.seek(0)
             
-            # Close PDF
-            doc.close()
-            
-            # Get file info
-            file_name = message.reply_to_message.document.file_name
-            file_size = message.reply_to_message.document.file_size / (1024 * 1024)  # MB
-            
             # Send preview with info
-            await message.reply_photo(
+            sent = await message.reply_photo(
                 photo=img_bytes,
-                caption=(
-                    "📄 **PDF তথ্য**\n\n"
-                    f"**📋 নাম:** {file_name}\n"
-                    f"**📚 মোট পেজ:** {total_pages}টি\n"
-                    f"**📦 ফাইল সাইজ:** {file_size:.1f} MB\n\n"
-                    "**🔍 প্রিভিউ:** প্রথম পেজ"
-                )
+                caption=pages_caption(document, result['pages'])
             )
             
+            # Remember the preview for next time
+            if sent and sent.photo:
+                await save_metadata(document, page_count=result['pages'], preview_file_id=sent.photo.file_id)
+        
         except Exception as e:
             raise e
-            
+        
         finally:
             # Clean up
-            try:
-                if os.path.exists(input_path):
-                    os.remove(input_path)
-                if os.path.exists(preview_path):
-                    os.remove(preview_path)
-                os.rmdir(temp_dir)
-            except:
-                pass
-                
-            # Clean up state
-            if user_id in status_messages:
-                try:
-                    await status_messages[user_id].delete()
-                except:
-                    pass
-                del status_messages[user_id]
-            if user_id in user_states:
-                user_states[user_id].reset()
-                del user_states[user_id]
-            if user_id in last_progress_update:
-                del last_progress_update[user_id]
-                
+            release_scratch(temp_dir)
+            await status.delete()
+    
     except Exception as e:
-        # Clean up state on error
-        if user_id in user_states:
-            user_states[user_id].reset()
-            del user_states[user_id]
-        if user_id in status_messages:
-            try:
-                await status_messages[user_id].delete()
-            except:
-                pass
-            del status_messages[user_id]
-        if user_id in last_progress_update:
-            del last_progress_update[user_id]
-            
         await message.reply_text(
             "❌ **এরর!**\n\n"
             f"কারণ: {str(e)}\n"
             "দয়া করে আবার চেষ্টা করুন।"
-        ) 
\ No newline at end of file
+        )
@@ -0,0 +1,459 @@
+from pyrogram import Client
+from pyrogram.types import Message
+import os
+import re
+import bisect
+import zlib
+import asyncio
+import fitz
+from typing import Dict, List, Optional, Tuple
+
+# Telegram serves files in 1 MiB chunks
+CHUNK_SIZE = 1024 * 1024
+
+# Give up and download the whole file if page 1 needs more chunks than this
+RANGE_READ_MAX_CHUNKS = int(os.getenv('RANGE_READ_MAX_CHUNKS', 16))
+
+class RangeReadError(Exception):
+    """The PDF can't be read partially and has to be downloaded."""
+
+class ChunkReader:
+    """Random access to a Telegram document, fetching only the chunks read."""
+
+    def __init__(self, client: Client, message: Message):
+        self.client = client
+        self.message = message
+        self.size = message.document.file_size
+        self.chunks: Dict[int, asyncio.Task] = {}
+
+    async def _fetch(self, index: int) -> bytes:
+        chunks = [chunk async for chunk in self.client.stream_media(self.message, limit=1, offset=index)]
+        if not chunks:
+            raise RangeReadError(f"chunk {index} is empty")
+        return chunks[0]
+
+    def _chunk(self, index: int) -> asyncio.Task:
+        if index not in self.chunks:
+            if len(self.chunks) >= RANGE_READ_MAX_CHUNKS:
+                raise RangeReadError("too many chunks needed")
+            self.chunks[index] = asyncio.ensure_future(self._fetch(index))
+        return self.chunks[index]
+
+    async def read(self, start: int, end: int) -> bytes:
+        """Read bytes start..end, fetching missing chunks concurrently."""
+        end = min(end, self.size)
+        if start >= end:
+            return b""
+        first = start // CHUNK_SIZE
+        last = (end - 1) // CHUNK_SIZE
+        data = b"".join(await asyncio.gather(*(self._chunk(i) for i in range(first, last + 1))))
+        return data[start - first * CHUNK_SIZE:end - first * CHUNK_SIZE]
+
+    def close(self):
+        for task in self.chunks.values():
+            task.cancel()
+
+def _ref(text: bytes, key: bytes) -> Optional[int]:
+    """Object number of an indirect reference stored under key."""
+    match = re.search(rb"/" + key + rb"\s+(\d+)\s+\d+\s+R", text)
+    return int(match[1]) if match else None
+
+def _int(text: bytes, key: bytes) -> Optional[int]:
+    """Direct integer value stored under key."""
+    match = re.search(rb"/" + key + rb"\s+(\d+)\b(?!\s+\d+\s+R)", text)
+    return int(match[1]) if match else None
+
+def _ints(text: bytes, key: bytes) -> Optional[List[int]]:
+    """Direct integer array stored under key."""
+    match = re.search(rb"/" + key + rb"\s*\[([\d\s]*)\]", text)
+    return [int(value) for value in match[1].split()] if match else None
+
+def _refs(text: bytes) -> List[int]:
+    """Object numbers of all indirect references in text."""
+    return [int(number) for number in re.findall(rb"(\d+)\s+\d+\s+R\b", text)]
+
+def _unpredict(data: bytes, columns: int) -> bytes:
+    """Undo PNG predictors (used by xref streams)."""
+    row_size = columns + 1
+    previous = bytearray(columns)
+    out = bytearray()
+    for start in range(0, len(data) - row_size + 1, row_size):
+        kind = data[start]
+        row = bytearray(data[start + 1:start + row_size])
+        for i in range(columns):
+            left = row[i - 1] if i else 0
+            up = previous[i]
+            up_left = previous[i - 1] if i else 0
+            if kind == 1:
+                row[i] = (row[i] + left) & 0xFF
+            elif kind == 2:
+                row[i] = (row[i] + up) & 0xFF
+            elif kind == 3:
+                row[i] = (row[i] + (left + up) // 2) & 0xFF
+            elif kind == 4:
+                estimate = left + up - up_left
+                distances = (abs(estimate - left), abs(estimate - up), abs(estimate - up_left))
+                row[i] = (row[i] + (left, up, up_left)[distances.index(min(distances))]) & 0xFF
+        out += row
+        previous = row
+    return bytes(out)
+
+class RangePDF:
+    """Minimal PDF parser that reads the cross-reference data and the
+    objects page 1 needs through a ChunkReader."""
+
+    def __init__(self, reader: ChunkReader):
+        self.reader = reader
+        self.entries: Dict[int, Tuple] = {}  # Object number -> (1, offset) or (2, stream, index)
+        self.offsets: List[int] = []  # Sorted start offsets, used to find where objects end
+        self.trailer = b""
+        self.object_streams: Dict[int, asyncio.Task] = {}
+
+    async def load_xref(self):
+        """Read every cross-reference section, newest first."""
+        size = self.reader.size
+        tail = await self.reader.read(max(0, size - 1024), size)
+        matches = re.findall(rb"startxref\s+(\d+)", tail)
+        if not matches:
+            raise RangeReadError("startxref not found")
+
+        offset = int(matches[-1])
+        section_offsets = set()
+        while offset is not None:
+            if offset in section_offsets or offset >= size:
+                raise RangeReadError("bad xref offset")
+            section_offsets.add(offset)
+            head = await self.reader.read(offset, offset + 16)
+            if head.lstrip().startswith(b"xref"):
+                trailer = await self._read_xref_table(offset)
+                # Hybrid files keep compressed objects in a separate stream
+                stream_offset = _int(trailer, b"XRefStm")
+                if stream_offset is not None:
+                    section_offsets.add(stream_offset)
+                    await self._read_xref_stream(stream_offset)
+            else:
+                trailer = await self._read_xref_stream(offset)
+            if not self.trailer:
+                self.trailer = trailer
+            offset = _int(trailer, b"Prev")
+
+        if b"/Encrypt" in self.trailer:
+            raise RangeReadError("encrypted")
+        self.offsets = sorted(
+            {entry[1] for entry in self.entries.values() if entry[0] == 1} | section_offsets | {size}
+        )
+
+    def _add_entry(self, number: int, entry: Tuple):
+        # Sections are read newest first, keep the first entry seen
+        if number not in self.entries:
+            self.entries[number] = entry
+
+    async def _read_xref_table(self, offset: int) -> bytes:
+        data = await self.reader.read(offset, offset + 64)
+        pos = offset + re.match(rb"\s*xref\s*", data).end()
+        while True:
+            line = await self.reader.read(pos, pos + 64)
+            header = re.match(rb"(\d+)[ \t]+(\d+)[ \t]*(?:\r\n|\r|\n)", line)
+            if not header:
+                break
+            first, count = int(header[1]), int(header[2])
+            pos += header.end()
+            rows = await self.reader.read(pos, pos + count * 20)
+            for i in range(count):
+                row = re.match(rb"(\d{10}) (\d{5}) ([nf])", rows[i * 20:i * 20 + 20])
+                if not row:
+                    raise RangeReadError("bad xref entry")
+                if row[3] == b"n" and int(row[1]):
+                    self._add_entry(first + i, (1, int(row[1])))
+            pos += count * 20
+            while pos < self.reader.size and (await self.reader.read(pos, pos + 1)).isspace():
+                pos += 1
+
+        trailer = await self.reader.read(pos, pos + 4096)
+        if not trailer.startswith(b"trailer"):
+            raise RangeReadError("trailer not found")
+        end = trailer.find(b"startxref")
+        return trailer[:end] if end != -1 else trailer
+
+    async def _read_stream(self, offset: int, end: int = None) -> Tuple[bytes, bytes]:
+        """Read a stream object at offset. Returns its dictionary and decoded data."""
+        head = await self.reader.read(offset, min(end or self.reader.size, offset + 4096))
+        match = re.match(rb"\s*\d+\s+\d+\s+obj(.*?)stream(?:\r\n|\n|\r)", head, re.S)
+        if not match:
+            raise RangeReadError("stream not found")
+        info = match[1]
+
+        length = _int(info, b"Length")
+        if length is None:
+            length_ref = _ref(info, b"Length")
+            if length_ref is None or length_ref not in self.entries:
+                raise RangeReadError("unknown stream length")
+            length_object = re.sub(rb"^\s*\d+\s+\d+\s+obj", b"", await self.get_object(length_ref))
+            length = int(length_object.split()[0])
+
+        start = offset + match.end()
+        data = await self.reader.read(start, start + length)
+
+        filters = re.findall(rb"/(\w+)", (re.search(rb"/Filter\s*(\[[^\]]*\]|/\w+)", info) or [b"", b""])[1])
+        if filters == [b"FlateDecode"]:
+            data = zlib.decompress(data)
+        elif filters:
+            raise RangeReadError("unsupported filter")
+
+        predictor = _int(info, b"Predictor")
+        if predictor and predictor >= 10:
+            data = _unpredict(data, _int(info, b"Columns") or 1)
+        elif predictor and predictor > 1:
+            raise RangeReadError("unsupported predictor")
+        return info, data
+
+    async def _read_xref_stream(self, offset: int) -> bytes:
+        info, data = await self._read_stream(offset)
+        if not re.search(rb"/Type\s*/XRef\b", info):
+            raise RangeReadError("not an xref stream")
+
+        widths = _ints(info, b"W")
+        index = _ints(info, b"Index") or [0, _int(info, b"Size")]
+        if not widths or len(widths) != 3 or None in index:
+            raise RangeReadError("bad xref stream")
+        row_size = sum(widths)
+
+        def field(row: bytes, start: int, width: int, default: int) -> int:
+            return int.from_bytes(row[start:start + width], "big") if width else default
+
+        pos = 0
+        for first, count in zip(index[::2], index[1::2]):
+            for number in range(first, first + count):
+                row = data[pos:pos + row_size]
+                pos += row_size
+                kind = field(row, 0, widths[0], 1)
+                value = field(row, widths[0], widths[1], 0)
+                extra = field(row, widths[0] + widths[1], widths[2], 0)
+                if kind == 1:
+                    self._add_entry(number, (1, value))
+                elif kind == 2:
+                    self._add_entry(number, (2, value, extra))
+                else:
+                    self._add_entry(number, (0,))
+        return info
+
+    async def _load_object_stream(self, number: int) -> List[bytes]:
+        entry = self.entries.get(number)
+        if not entry or entry[0] != 1:
+            raise RangeReadError("missing object stream")
+        info, data = await self._read_stream(entry[1], self._object_end(entry[1]))
+        count, first = _int(info, b"N"), _int(info, b"First")
+        if count is None or first is None:
+            raise RangeReadError("bad object stream")
+        header = [int(value) for value in data[:first].split()]
+        starts = header[1::2][:count] + [len(data) - first]
+        return [data[first + start:first + end] for start, end in zip(starts, starts[1:])]
+
+    def _object_end(self, offset: int) -> int:
+        return self.offsets[bisect.bisect_right(self.offsets, offset)]
+
+    async def raw_object(self, number: int) -> bytes:
+        """Complete "N G obj ... endobj" bytes of an object."""
+        entry = self.entries.get(number)
+        if not entry or entry[0] == 0:
+            return b"%d 0 obj\nnull\nendobj\n" % number
+
+        if entry[0] == 2:
+            if entry[1] not in self.object_streams:
+                self.object_streams[entry[1]] = asyncio.ensure_future(self._load_object_stream(entry[1]))
+            objects = await self.object_streams[entry[1]]
+            if entry[2] >= len(objects):
+                raise RangeReadError("bad object stream index")
+            return b"%d 0 obj\n%s\nendobj\n" % (number, objects[entry[2]].strip())
+
+        offset = entry[1]
+        text = await self.reader.read(offset, self._object_end(offset))
+        header = re.match(rb"\s*(\d+)\s+\d+\s+obj", text)
+        end = text.rfind(b"endobj")
+        if not header or int(header[1]) != number or end == -1:
+            raise RangeReadError(f"object {number} not found")
+        return text[len(text) - len(text.lstrip()):end + 6] + b"\n"
+
+    async def get_object(self, number: int) -> bytes:
+        """Text of an object, without any stream data."""
+        text = await self.raw_object(number)
+        stream = re.search(rb"stream(?:\r\n|\n|\r)", text)
+        return text[:stream.start()] if stream else text
+
+    async def page_tree(self) -> Tuple[bytes, int, int]:
+        """Find the catalog and the root page tree node.
+
+        Returns the catalog text, the page tree's object number and the
+        document's page count.
+        """
+        root_number = _ref(self.trailer, b"Root")
+        if root_number is None:
+            raise RangeReadError("root not found")
+        root = await self.get_object(root_number)
+        pages_number = _ref(root, b"Pages")
+        if pages_number is None:
+            raise RangeReadError("page tree not found")
+        page_count = _int(await self.get_object(pages_number), b"Count")
+        if not page_count:
+            raise RangeReadError("page count not found")
+        return root, pages_number, page_count
+
+    async def first_page_pdf(self) -> Tuple[int, bytes]:
+        """Build a one-page PDF holding page 1 and everything it uses.
+
+        Returns the original document's page count and the new PDF.
+        """
+        root, pages_number, page_count = await self.page_tree()
+
+        # Walk down the first kids to page 1, collecting inherited attributes
+        inherited: Dict[bytes, bytes] = {}
+        node_number = pages_number
+        for _ in range(64):
+            node = await self.get_object(node_number)
+            if not re.search(rb"/Type\s*/Pages\b", node):
+                break
+            for key in INHERITABLE_KEYS:
+                value = _value(node, key)
+                if value is not None:
+                    inherited[key] = value
+            kids = re.search(rb"/Kids\s*\[(.*?)\]", node, re.S)
+            first_kid = _refs(kids[1])[:1] if kids else []
+            if not first_kid:
+                raise RangeReadError("bad page tree")
+            node_number = first_kid[0]
+        else:
+            raise RangeReadError("page tree too deep")
+        page_number = node_number
+
+        # Fetch every object reachable from page 1, one level at a time
+        objects: Dict[int, bytes] = {}
+        pending = [page_number] + _refs(b" ".join(inherited.values()))
+        ocproperties = _ref(root, b"OCProperties")
+        if ocproperties:
+            pending.append(ocproperties)
+        while pending:
+            level = [number for number in dict.fromkeys(pending) if number not in objects]
+            texts = await asyncio.gather(*(self.raw_object(number) for number in level))
+            pending = []
+            for number, text in zip(level, texts):
+                objects[number] = text
+                stream = re.search(rb"stream(?:\r\n|\n|\r)", text)
+                pending += _refs(_PARENT.sub(b"", text[:stream.start()] if stream else text))
+
+        # New page tree and catalog
+        new_pages = max(objects) + 1
+        new_root = new_pages + 1
+        page = objects[page_number]
+        page = _PARENT.sub(b"", page, count=1)
+        page = re.sub(rb"<<", b"<< /Parent %d 0 R" % new_pages, page, count=1)
+        objects[page_number] = page
+
+        attributes = b"".join(b" /%s %s" % (key, value) for key, value in inherited.items())
+        objects[new_pages] = b"%d 0 obj\n<< /Type /Pages /Kids [%d 0 R] /Count 1%s >>\nendobj\n" % (
+            new_pages, page_number, attributes
+        )
+        catalog = b"/OCProperties %d 0 R" % ocproperties if ocproperties else b""
+        objects[new_root] = b"%d 0 obj\n<< /Type /Catalog /Pages %d 0 R %s>>\nendobj\n" % (
+            new_root, new_pages, catalog
+        )
+
+        return page_count, _write_pdf(objects, new_root)
+
+# Page attributes a page can inherit from its parents
+INHERITABLE_KEYS = (b"Resources", b"MediaBox", b"CropBox", b"Rotate")
+
+_PARENT = re.compile(rb"/Parent\s+\d+\s+\d+\s+R")
+
+def _value(text: bytes, key: bytes) -> Optional[bytes]:
+    """Raw value stored under key in a dictionary (handles nesting)."""
+    match = re.search(rb"/" + key + rb"(?![\w.#-])\s*", text)
+    if not match:
+        return None
+    start = pos = match.end()
+
+    reference = re.match(rb"\d+\s+\d+\s+R\b", text[pos:])
+    if reference:
+        return reference[0]
+    if text[pos:pos + 2] == b"<<" or text[pos:pos + 1] == b"[":
+        depth = 0
+        while pos < len(text):
+            if text[pos:pos + 2] in (b"<<", b">>"):
+                depth += 1 if text[pos:pos + 2] == b"<<" else -1
+                pos += 2
+            else:
+                if text[pos:pos + 1] == b"[":
+                    depth += 1
+                elif text[pos:pos + 1] == b"]":
+                    depth -= 1
+                pos += 1
+            if depth == 0:
+                return text[start:pos]
+        raise RangeReadError("unbalanced dictionary")
+
+    token = re.match(rb"[^\s/<>\[\]()]*", text[pos + 1:] if text[pos:pos + 1] == b"/" else text[pos:])
+    return text[pos:pos + (1 if text[pos:pos + 1] == b"/" else 0) + token.end()]
+
+def _write_pdf(objects: Dict[int, bytes], root: int) -> bytes:
+    """Serialize complete objects into a PDF with a fresh xref table."""
+    out = bytearray(b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n")
+    offsets = {}
+    for number in sorted(objects):
+        offsets[number] = len(out)
+        out += objects[number]
+
+    size = max(objects) + 1
+    xref = len(out)
+    out += b"xref\n0 %d\n" % size
+    for number in range(size):
+        if number in offsets:
+            out += b"%010d 00000 n \n" % offsets[number]
+        else:
+            out += b"0000000000 65535 f \n"
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (size, root, xref)
+    return bytes(out)
+
+async def read_page_count(client: Client, message: Message) -> int:
+    """Get the page count by reading only the document's cross-reference
+    data and page tree root.
+
+    Raises RangeReadError if the file has to be downloaded instead.
+    """
+    reader = ChunkReader(client, message)
+    try:
+        pdf = RangePDF(reader)
+        await pdf.load_xref()
+        return (await pdf.page_tree())[2]
+    except (ValueError, IndexError, TypeError, zlib.error) as e:
+        raise RangeReadError(str(e))
+    finally:
+        reader.close()
+
+async def read_first_page(client: Client, message: Message, zoom: float = 0.5) -> Tuple[int, fitz.Pixmap]:
+    """Get the page count and a render of page 1 by reading only the parts
+    of the document they need.
+
+    Raises RangeReadError if the file has to be downloaded instead.
+    """
+    reader = ChunkReader(client, message)
+    try:
+        pdf = RangePDF(reader)
+        await pdf.load_xref()
+        page_count, page_pdf = await pdf.first_page_pdf()
+    except (ValueError, IndexError, TypeError, zlib.error) as e:
+        raise RangeReadError(str(e))
+    finally:
+        reader.close()
+
+    # Any repair or warning means the page wasn't rebuilt cleanly
+    fitz.TOOLS.mupdf_warnings()
+    doc = fitz.open(stream=page_pdf, filetype="pdf")
+    try:
+        pix = doc[0].get_pixmap(matrix=fitz.Matrix(zoom, zoom))
+        if doc.is_repaired or fitz.TOOLS.mupdf_warnings():
+            raise RangeReadError("incomplete page data")
+    except RuntimeError as e:
+        raise RangeReadError(str(e))
+    finally:
+        doc.close()
+
+    return page_count, pix
@@ -0,0 +1,94 @@
+import asyncio
+import multiprocessing
+import os
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from .state import current_token
+
+# Maximum number of CPU-heavy jobs running at once
+WORKER_PROCESSES = int(os.getenv('WORKER_PROCESSES', os.cpu_count() or 1))
+# Seconds a worker may run before it's killed. A child forked while another
+# thread held a lock (e.g. in malloc or logging) can hang forever.
+WORKER_TIMEOUT = int(os.getenv('WORKER_TIMEOUT', 30 * 60))
+
+# Fork so workers don't re-import bot.py (it starts the bot at import time)
+_context = multiprocessing.get_context("fork")
+_semaphore = None
+_thread_pool = None
+
+def _get_semaphore() -> asyncio.Semaphore:
+    """Get the semaphore limiting concurrent worker processes."""
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(WORKER_PROCESSES)
+    return _semaphore
+
+def _worker_main(conn, func, args):
+    """Run func in the worker process and send back its result."""
+    try:
+        conn.send((True, func(*args)))
+    except BaseException as e:
+        conn.send((False, f"{type(e).__name__}: {e}\n{traceback.format_exc()}"))
+    finally:
+        conn.close()
+
+async def run_in_process(func, *args):
+    """Run a CPU-heavy function in a separate worker process.
+
+    Each call gets its own process so cancelling the awaiting task can kill
+    it right away instead of waiting for the work to finish. A worker
+    still running after WORKER_TIMEOUT seconds is killed.
+    """
+    async with _get_semaphore():
+        loop = asyncio.get_running_loop()
+        parent_conn, child_conn = _context.Pipe(duplex=False)
+        process = _context.Process(target=_worker_main, args=(child_conn, func, args), daemon=True)
+        process.start()
+        child_conn.close()
+
+        # Let /allcancel kill the worker directly
+        token = current_token.get()
+        if token:
+            token.processes.add(process)
+
+        # Wake up when the worker sends its result or exits
+        ready = loop.create_future()
+        def on_ready():
+            if not ready.done():
+                ready.set_result(None)
+        loop.add_reader(parent_conn.fileno(), on_ready)
+
+        try:
+            try:
+                await asyncio.wait_for(ready, WORKER_TIMEOUT)
+            except asyncio.TimeoutError:
+                raise Exception(f"ওয়ার্কার প্রসেস {WORKER_TIMEOUT} সেকেন্ডে শেষ হয়নি")
+            try:
+                ok, result = parent_conn.recv()
+            except EOFError:
+                raise Exception(f"ওয়ার্কার প্রসেস বন্ধ হয়ে গেছে (exit code {process.exitcode})")
+        finally:
+            loop.remove_reader(parent_conn.fileno())
+            parent_conn.close()
+            if process.is_alive():
+                process.kill()
+            process.join()
+            if token:
+                token.processes.discard(process)
+
+        if not ok:
+            print(f"Worker error: {result}")
+            raise Exception(result.splitlines()[0])
+        return result
+
+async def run_in_thread(func, *args):
+    """Run a short blocking function in the shared thread pool.
+
+    Meant for work like image transcoding that releases the GIL and is too
+    small to be worth a process of its own.
+    """
+    global _thread_pool
+    if _thread_pool is None:
+        _thread_pool = ThreadPoolExecutor(max_workers=WORKER_PROCESSES)
+    return await asyncio.get_running_loop().run_in_executor(_thread_pool, func, *args)
@@ -1,22 +1,30 @@
 from pyrogram import Client, filters
 from pyrogram.types import Message
 import math
+import asyncio
+from typing import List
+
+from .pages import get_pdf_messages, inspect_pdf, short_name, MAX_PARALLEL_FILES
+from .scratch import create_scratch_dir, release_scratch
+
+# Slides printed on one sheet for each layout
+SLIDES_PER_SHEET = {
+    'L4': 8,   # 4 slides per side * 2 sides
+    'L6': 12,  # 6 slides per side * 2 sides
+    'L8': 16,  # 8 slides per side * 2 sides
+    'P1': 2,   # 1 slide per side * 2 sides
+    'P3': 6,   # 3 slides per side * 2 sides
+    'P4': 8    # 4 slides per side * 2 sides
+}
+
+WHATSAPP_LINK = "https://api.whatsapp.com/send?phone=8801880215950&text=PDF%20প্রিন্টিং%20সম্পর্কে%20জানতে%20চাই"
 
 def calculate_sheets(total_pages: int, layout: str) -> float:
     """Calculate number of sheets needed."""
-    slides_per_sheet = {
-        'L4': 8,   # 4 slides per side * 2 sides
-        'L6': 12,  # 6 slides per side * 2 sides
-        'L8': 16,  # 8 slides per side * 2 sides
-        'P1': 2,   # 1 slide per side * 2 sides
-        'P3': 6,   # 3 slides per side * 2 sides
-        'P4': 8    # 4 slides per side * 2 sides
-    }
-    
-    if layout not in slides_per_sheet:
+    if layout not in SLIDES_PER_SHEET:
         return 0
         
-    return math.ceil(total_pages / slides_per_sheet[layout])
+    return math.ceil(total_pages / SLIDES_PER_SHEET[layout])
 
 def calculate_price(sheets: int, price_per_sheet: float = 1.8) -> float:
     """Calculate total price."""
@@ -43,19 +51,74 @@ async def show_layout_guide(message: Message):
         "• মোট দাম = শীট সংখ্যা × ১.৮০\n"
         "• কুরিয়ার চার্জ আলাদা (WhatsApp এ যোগাযোগ করুন)\n\n"
         "**📱 যোগাযোগ:**\n"
-        "• [WhatsApp করুন](https://api.whatsapp.com/send?phone=8801880215950&text=PDF%20প্রিন্টিং%20সম্পর্কে%20জানতে%20চাই)\n\n"
+        f"• [WhatsApp করুন]({WHATSAPP_LINK})\n\n"
         "**📝 কমান্ড ব্যবহার:**\n"
         "• একটি PDF: /price 23 -L4\n"
         "• একাধিক PDF: /price 23,45,67 -L4\n"
+        "• PDF এ রিপ্লাই দিয়ে: /price (অ্যালবাম হলে সব ফাইল একসাথে)\n"
         "• শুধু গাইড দেখতে: /price",
         disable_web_page_preview=True
     )
 
+async def price_documents(client: Client, message: Message, pdf_messages: List[Message]):
+    """Quote every layout for a set of PDF documents."""
+    status = await message.reply_text(f"🔍 **{len(pdf_messages)}টি PDF এর পেজ গোনা হচ্ছে...**")
+    temp_dir = create_scratch_dir()
+    semaphore = asyncio.Semaphore(MAX_PARALLEL_FILES)
+    
+    async def count_pages(pdf_message: Message) -> int:
+        async with semaphore:
+            return (await inspect_pdf(client, pdf_message, temp_dir, preview=False))['pages']
+    
+    try:
+        pages = await asyncio.gather(*(count_pages(pdf_message) for pdf_message in pdf_messages))
+    except Exception:
+        try:
+            await status.delete()
+        except:
+            pass
+        raise
+    finally:
+        release_scratch(temp_dir)
+    
+    file_lines = "".join(
+        f"{i}. {short_name(pdf_message.document.file_name)} - {page}টি পেজ\n"
+        for i, (pdf_message, page) in enumerate(zip(pdf_messages, pages), 1)
+    )
+    
+    # Each file is printed separately, so sheets are counted per file
+    layout_lines = ""
+    for layout, slides in SLIDES_PER_SHEET.items():
+        sheets = sum(calculate_sheets(page, layout) for page in pages)
+        layout_lines += f"• {layout} (শীটে {slides}টি): {sheets}টি শীট - {calculate_price(sheets):.1f} টাকা\n"
+    
+    text = (
+        "📊 **প্রিন্টিং হিসাব**\n\n"
+        f"**📑 ফাইলসমূহ:**\n{file_lines}\n"
+        f"**📚 মোট পেজ:** {sum(pages)}টি\n\n"
+        f"**🖨️ লেআউট অনুযায়ী দাম:**\n{layout_lines}\n"
+        "**📱 যোগাযোগ:**\n"
+        f"• [WhatsApp করুন]({WHATSAPP_LINK})\n\n"
+        "**ℹ️ বিস্তারিত জানতে** /price **কমান্ড দিন।**"
+    )
+    try:
+        await status.edit_text(text, disable_web_page_preview=True)
+    except Exception as e:
+        print(f"Edit error: {str(e)}")
+        await message.reply_text(text, disable_web_page_preview=True)
+
 async def price_command(client: Client, message: Message):
     """Handle /price command."""
     try:
-        # Get command text
-        cmd = message.text.strip()
+        # Get command text (the command can also be a document's caption)
+        cmd = (message.text or message.caption or "").strip()
+        
+        # Quote replied documents or a media group directly
+        if message.reply_to_message or message.document:
+            pdf_messages = await get_pdf_messages(client, message)
+            if pdf_messages:
+                await price_documents(client, message, pdf_messages)
+                return
         
         # If no arguments, show guide
         if cmd == "/price":
@@ -79,8 +142,7 @@ async def price_command(client: Client, message: Message):
         layout = parts[2][1:].upper()  # Remove - and convert to uppercase
         
         # Validate layout
-        valid_layouts = ['L4', 'L6', 'L8', 'P1', 'P3', 'P4']
-        if layout not in valid_layouts:
+        if layout not in SLIDES_PER_SHEET:
             await message.reply_text(
                 "❌ **অবৈধ লেআউট!**\n\n"
                 "সঠিক লেআউট:\n"
@@ -130,9 +192,9 @@ async def price_command(client: Client, message: Message):
             f"• মোট দাম: {total_price:.1f} টাকা\n\n"
             f"**🖨️ প্রিন্টিং তথ্য:**\n"
             f"• লেআউট: {layout}\n"
-            f"• প্রতি শীটে স্লাইড: {8 if layout == 'L4' else 12 if layout == 'L6' else 16 if layout == 'L8' else 2 if layout == 'P1' else 6 if layout == 'P3' else 8}টি\n\n"
+            f"• প্রতি শীটে স্লাইড: {SLIDES_PER_SHEET[layout]}টি\n\n"
             "**📱 যোগাযোগ:**\n"
-            "• [WhatsApp করুন](https://api.whatsapp.com/send?phone=8801880215950&text=PDF%20প্রিন্টিং%20সম্পর্কে%20জানতে%20চাই)\n\n"
+            f"• [WhatsApp করুন]({WHATSAPP_LINK})\n\n"
             "**ℹ️ বিস্তারিত জানতে** /price **কমান্ড দিন।**",
             disable_web_page_preview=True
         )
@@ -1,57 +1,260 @@
 from pyrogram.types import Message
+from pyrogram.errors import FloodWait, MessageNotModified
+import asyncio
+import os
 import time
 import humanize
-from .state import status_messages, user_states, last_progress_update
+from typing import Optional
+from .state import user_states, jobs, get_job
 
-async def edit_or_reply(message: Message, user_id: int, text: str):
-    """Edit existing status message or send new one."""
+# Progress edits of one status message are at least this many seconds apart
+PROGRESS_INTERVAL = 5
+# Status message edits per second across all users (Telegram limits bots globally)
+STATUS_EDITS_PER_SECOND = float(os.getenv('STATUS_EDITS_PER_SECOND', 20))
+
+class TokenBucket:
+    """Allow rate operations per second on average, in bursts of up to burst."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+_bucket = TokenBucket(STATUS_EDITS_PER_SECOND, STATUS_EDITS_PER_SECOND)
+
+async def _show(message: Message, user_id: int, text: str, create: bool):
+    """Put text in the user's status message, sending one if create is set."""
+    job = get_job(user_id) if create else jobs.get(user_id)
+    if job is None:
+        return
+    status = job.status_message
+    if status is None and not create:
+        return
+
+    # Telegram rejects edits that change nothing
+    if status is not None and job.status_sent and job.status_sent[0] is status and job.status_sent[1] == text:
+        return
+
+    # Still waiting out a FloodWait, show it afterwards
+    if time.time() < job.postponed_until:
+        job.pending_status = (message, text)
+        _schedule(user_id)
+        return
+
+    await _bucket.acquire()
     try:
-        if user_id in status_messages:
+        if status is not None:
             try:
-                await status_messages[user_id].edit_text(text)
-                return
+                await status.edit_text(text)
+            except (FloodWait, MessageNotModified):
+                raise
             except Exception as e:
                 print(f"Edit error: {str(e)}")
-        
-        # If edit fails or no message exists, send new
-        status_messages[user_id] = await message.reply_text(text)
-            
+                if not create:
+                    return
+                # The message is gone, send a new one
+                status = None
+        if status is None:
+            status = job.status_message = await message.reply_text(text)
+        job.status_sent = (status, text)
+        job.last_progress = time.time()
+    except MessageNotModified:
+        job.status_sent = (status, text)
+    except FloodWait as e:
+        print(f"FloodWait: status updates for user {user_id} postponed {e.value}s")
+        job.postponed_until = time.time() + e.value
+        if job.pending_status is None:
+            job.pending_status = (message, text)
+        _schedule(user_id)
+
+def _schedule(user_id: int):
+    job = jobs.get(user_id)
+    if job and job.status_task is None:
+        job.status_task = asyncio.create_task(_flush(user_id))
+
+async def _flush(user_id: int):
+    """Show a job's latest pending status once its next edit is due."""
+    try:
+        while True:
+            job = jobs.get(user_id)
+            if job is None or job.pending_status is None:
+                return
+            due = max((job.last_progress or 0) + PROGRESS_INTERVAL, job.postponed_until)
+            if due > time.time():
+                await asyncio.sleep(due - time.time())
+                continue
+            message, text = job.pending_status
+            job.pending_status = None
+            await _show(message, user_id, text, create=False)
     except Exception as e:
         print(f"Status update error: {str(e)}")
+    finally:
+        job = jobs.get(user_id)
+        if job and job.status_task is asyncio.current_task():
+            job.status_task = None
+
+async def edit_or_reply(message: Message, user_id: int, text: str):
+    """Show a new step of a job in its status message, sending one if needed."""
+    try:
+        job = get_job(user_id)
+        # A newer step replaces progress that hasn't been shown yet
+        job.pending_status = None
+        await _show(message, user_id, text, create=True)
+    except Exception as e:
+        print(f"Status update error: {str(e)}")
+
+async def replace_status(message: Message, user_id: int, text: str):
+    """Show text in a new status message, deleting the old one.
+
+    Keeps the status below messages the user sent since the last one.
+    """
+    try:
+        job = get_job(user_id)
+        job.pending_status = None
+        status, job.status_message = job.status_message, None
+        if status is not None:
+            try:
+                await status.delete()
+            except:
+                pass
+        await _show(message, user_id, text, create=True)
+    except Exception as e:
+        print(f"Status update error: {str(e)}")
+
+def report_progress(message: Message, user_id: int, text: str):
+    """Queue a progress update for the job's status message.
+
+    Returns right away. Updates are coalesced: only the latest text is
+    shown, at most once every PROGRESS_INTERVAL seconds, and only while
+    the job has a status message.
+    """
+    # Check if operation was cancelled
+    if user_id not in user_states:
+        return
+    get_job(user_id).pending_status = (message, text)
+    _schedule(user_id)
+
+def progress_bar(percentage: float) -> str:
+    return "".join(
+        "█" if i <= percentage / 5 else "░"
+        for i in range(20)
+    )
+
+def progress_text(current: int, total: int, text: str, start_time: float) -> str:
+    """Status text with a progress bar, speed and time left for a transfer."""
+    percentage = (current * 100) / total if total > 0 else 0
+    elapsed_time = time.time() - start_time if start_time else 0
+    speed = current / elapsed_time if elapsed_time > 0 else 0
+    eta = (total - current) / speed if speed > 0 else 0
+
+    return (
+        f"{text}\n\n"
+        f"{progress_bar(percentage)} {percentage:.1f}%\n"
+        f"⚡ স্পীড: {humanize.naturalsize(speed)}/s\n"
+        f"⏱️ বাকি সময়: {humanize.naturaltime(eta, future=True)}"
+    )
 
 async def progress(current: int, total: int, message: Message, user_id: int, text: str, start_time: float):
-    """Update progress with rate limiting."""
+    """Transfer progress callback for Pyrogram downloads and uploads."""
     try:
-        now = time.time()
-        
-        # Check if operation was cancelled
-        if user_id not in user_states:
-            return
-        
-        # Update only if enough time has passed (5 seconds)
-        if user_id not in last_progress_update or (now - last_progress_update.get(user_id, 0)) >= 5.0:
-            last_progress_update[user_id] = now
-            
-            # Calculate progress
-            percentage = (current * 100) / total if total > 0 else 0
-            elapsed_time = time.time() - start_time if start_time else 0
-            speed = current / elapsed_time if elapsed_time > 0 else 0
-            eta = (total - current) / speed if speed > 0 else 0
-            
-            # Generate progress bar
-            progress_bar = "".join(
-                "█" if i <= percentage / 5 else "░"
-                for i in range(20)
-            )
-            
-            status_text = (
-                f"{text}\n\n"
-                f"{progress_bar} {percentage:.1f}%\n"
-                f"⚡ স্পীড: {humanize.naturalsize(speed)}/s\n"
-                f"⏱️ বাকি সময়: {humanize.naturaltime(eta, future=True)}"
-            )
-            
-            await edit_or_reply(message, user_id, status_text)
-            
+        report_progress(message, user_id, progress_text(current, total, text, start_time))
     except Exception as e:
-        print(f"Progress update error: {str(e)}") 
\ No newline at end of file
+        print(f"Progress update error: {str(e)}")
+
+class StatusMessage:
+    """A status message owned by one command rather than the user's job.
+
+    Light commands run next to the user's heavy job, so they keep their
+    own message. Edits follow the same rules as the job's status: the
+    global rate limit, no unchanged edits, progress at most once every
+    PROGRESS_INTERVAL seconds and nothing while under FloodWait.
+    """
+
+    def __init__(self, message: Message):
+        self.message = message  # Message the status replies to
+        self.status: Optional[Message] = None
+        self.text: Optional[str] = None  # Text last shown
+        self.pending: Optional[str] = None  # Progress not shown yet
+        self.last_edit = 0
+        self.postponed_until = 0
+        self.task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()  # One send or edit at a time
+
+    async def show(self, text: str):
+        """Show a new step, sending the message if needed."""
+        self.pending = None
+        await self._show(text)
+
+    def report(self, text: str):
+        """Queue a progress update. Only the latest text is shown."""
+        self.pending = text
+        if self.task is None:
+            self.task = asyncio.create_task(self._flush())
+
+    async def progress(self, current: int, total: int, text: str, start_time: float):
+        """Transfer progress callback for Pyrogram downloads and uploads."""
+        self.report(progress_text(current, total, text, start_time))
+
+    async def delete(self):
+        """Stop pending updates and delete the message."""
+        if self.task:
+            self.task.cancel()
+        self.pending = None
+        # Wait for a message still being sent, then delete it
+        async with self._lock:
+            if self.status:
+                try:
+                    await self.status.delete()
+                except:
+                    pass
+                self.status = None
+
+    async def _show(self, text: str):
+        async with self._lock:
+            if self.status is not None and text == self.text:
+                return
+            if time.time() < self.postponed_until:
+                self.report(text)
+                return
+
+            await _bucket.acquire()
+            try:
+                if self.status is None:
+                    self.status = await self.message.reply_text(text)
+                else:
+                    await self.status.edit_text(text)
+                self.text = text
+            except MessageNotModified:
+                self.text = text
+            except FloodWait as e:
+                print(f"FloodWait: status updates postponed {e.value}s")
+                self.postponed_until = time.time() + e.value
+                if self.pending is None:
+                    self.report(text)
+            except Exception as e:
+                print(f"Status update error: {str(e)}")
+            self.last_edit = time.time()
+
+    async def _flush(self):
+        try:
+            while self.pending is not None:
+                due = max(self.last_edit + PROGRESS_INTERVAL, self.postponed_until)
+                if due > time.time():
+                    await asyncio.sleep(due - time.time())
+                    continue
+                text, self.pending = self.pending, None
+                await self._show(text)
+        finally:
+            if self.task is asyncio.current_task():
+                self.task = None
@@ -0,0 +1,457 @@
+import fitz
+import numpy as np
+from PIL import Image
+import io
+import math
+import os
+import re
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+# Page rendering helpers, run inside worker processes (see pool.py)
+
+MAX_CHUNK_PAGES = 25  # Pages per worker job, keeps progress updates frequent
+DARK_THRESHOLD = int(os.getenv('INVERT_DARK_THRESHOLD', 128))  # Mean brightness below this is dark
+THUMBNAIL_ZOOM = 0.1  # Resolution of the dark page pre-pass
+EMPTY_CONTENT_RATIO = 0.03  # Pages with less ink than this are empty
+EMPTY_CHECK_ZOOM = 0.5  # Resolution of the blank page raster fallback
+
+def split_pages(total_pages: int, workers: int) -> List[Tuple[int, int]]:
+    """Split pages into (start, end) ranges to spread across workers."""
+    chunk = max(1, min(MAX_CHUNK_PAGES, math.ceil(total_pages / max(1, workers))))
+    return [(start, min(start + chunk, total_pages)) for start in range(0, total_pages, chunk)]
+
+def is_dark_page(page) -> bool:
+    """Classify a page as dark from a tiny grayscale thumbnail."""
+    mat = fitz.Matrix(THUMBNAIL_ZOOM, THUMBNAIL_ZOOM)
+    pix = page.get_pixmap(matrix=mat, colorspace=fitz.csGRAY, alpha=False)
+    gray = np.frombuffer(pix.samples, dtype=np.uint8)
+    return gray.mean() < DARK_THRESHOLD
+
+def render_inverted(page) -> bytes:
+    """Render a page and return it inverted as JPEG bytes."""
+    # Get pixmap with optimized resolution
+    zoom = 1.0
+    mat = fitz.Matrix(zoom, zoom)
+    pix = page.get_pixmap(matrix=mat, alpha=False)
+
+    # Convert to numpy array for faster processing
+    img_array = np.frombuffer(pix.samples, dtype=np.uint8)
+    img_array = img_array.reshape(pix.height, pix.width, 3)
+
+    # Fast inversion
+    img = Image.fromarray(255 - img_array)
+    img_bytes = io.BytesIO()
+    img.save(img_bytes, format='JPEG', quality=85, optimize=True)
+    return img_bytes.getvalue()
+
+def invert_page_range(input_path: str, start: int, end: int, dark_pages: Set[int] = None) -> Dict:
+    """Invert the dark pages among pages start..end-1.
+
+    Each page is first classified from a thumbnail, only dark pages get a
+    full render. dark_pages, when already known, replaces the thumbnail
+    pass. Returns JPEG bytes of the inverted pages keyed by page number
+    (light pages are left out and get copied unchanged), the dark page
+    numbers, plus (page, classify seconds, render seconds) timings for
+    every page.
+    """
+    doc = fitz.open(input_path)
+    inverted = {}
+    dark = []
+    timings = []
+
+    for page_num in range(start, end):
+        page = doc[page_num]
+
+        classify_start = time.perf_counter()
+        is_dark = page_num in dark_pages if dark_pages is not None else is_dark_page(page)
+        render_start = time.perf_counter()
+        if is_dark:
+            dark.append(page_num)
+
+        if is_dark:
+            inverted[page_num] = render_inverted(page)
+
+        timings.append((page_num, render_start - classify_start, time.perf_counter() - render_start))
+
+    doc.close()
+    return {'inverted': inverted, 'dark': dark, 'timings': timings}
+
+def has_little_ink(gray: np.ndarray) -> bool:
+    """Check if less than EMPTY_CONTENT_RATIO of a grayscale page is ink."""
+    ink = int(np.count_nonzero(gray < 250))
+    return ink * 100 < int(EMPTY_CONTENT_RATIO * 100) * gray.size
+
+def to_gray(img_array: np.ndarray) -> np.ndarray:
+    """Convert an RGB page to grayscale with integer math."""
+    rgb = img_array.astype(np.uint16)
+    return ((rgb[..., 0] * 77 + rgb[..., 1] * 150 + rgb[..., 2] * 29) >> 8).astype(np.uint8)
+
+def text_coverage(page) -> float:
+    """Share of the page covered by word boxes, an upper bound for text ink."""
+    area = abs(page.rect)
+    if not area:
+        return 0.0
+    return sum(abs(fitz.Rect(word[:4]) & page.rect) for word in page.get_text("words")) / area
+
+def is_empty_page(page) -> bool:
+    """Detect an empty page, rasterizing only when the content is unclear.
+
+    A page with only text can't have more ink than its word boxes cover,
+    so text alone covering less than EMPTY_CONTENT_RATIO is empty without
+    a render. Anything else is rendered at low zoom in grayscale and
+    checked for ink, so text counts against the same threshold as images
+    and drawings.
+    """
+    if not page.get_images() and not page.get_drawings():
+        if text_coverage(page) < EMPTY_CONTENT_RATIO:
+            return True
+
+    mat = fitz.Matrix(EMPTY_CHECK_ZOOM, EMPTY_CHECK_ZOOM)
+    pix = page.get_pixmap(matrix=mat, colorspace=fitz.csGRAY, alpha=False)
+    return has_little_ink(np.frombuffer(pix.samples, dtype=np.uint8))
+
+def invert_and_analyze_range(input_path: str, start: int, end: int, dark_pages: Set[int] = None) -> Dict:
+    """Invert dark pages and detect empty ones.
+
+    Light pages never get a full render: emptiness comes from the text
+    layer, image list and drawings, or a small grayscale render. Dark
+    pages are rendered once and both inverted and checked for emptiness
+    from the same pixels. Returns the same data as invert_page_range()
+    plus the list of empty page numbers.
+    """
+    doc = fitz.open(input_path)
+    inverted = {}
+    dark = []
+    empty = []
+    timings = []
+
+    for page_num in range(start, end):
+        page = doc[page_num]
+
+        classify_start = time.perf_counter()
+        is_dark = page_num in dark_pages if dark_pages is not None else is_dark_page(page)
+        render_start = time.perf_counter()
+        if is_dark:
+            dark.append(page_num)
+
+        if not is_dark:
+            if is_empty_page(page):
+                empty.append(page_num)
+        else:
+            pix = page.get_pixmap(matrix=fitz.Matrix(1.0, 1.0), alpha=False)
+            img_array = np.frombuffer(pix.samples, dtype=np.uint8)
+            img_array = 255 - img_array.reshape(pix.height, pix.width, 3)
+
+            if has_little_ink(to_gray(img_array)):
+                empty.append(page_num)
+            else:
+                img = Image.fromarray(img_array)
+                img_bytes = io.BytesIO()
+                img.save(img_bytes, format='JPEG', quality=85, optimize=True)
+                inverted[page_num] = img_bytes.getvalue()
+
+        timings.append((page_num, render_start - classify_start, time.perf_counter() - render_start))
+
+    doc.close()
+    return {'inverted': inverted, 'dark': dark, 'empty': empty, 'timings': timings}
+
+def timing_summary(timings: List[Tuple[int, float, float]]) -> str:
+    """Summarize per-page classify/render timings for the log."""
+    if not timings:
+        return "no pages"
+    classify = sum(t[1] for t in timings)
+    render = sum(t[2] for t in timings)
+    slowest = max(timings, key=lambda t: t[1] + t[2])
+    return (
+        f"{len(timings)} pages, classify {classify * 1000 / len(timings):.1f}ms/page, "
+        f"render {render:.2f}s total, slowest page {slowest[0] + 1} "
+        f"({(slowest[1] + slowest[2]) * 1000:.0f}ms)"
+    )
+
+def assemble_pages(input_path: str, output_path: str, inverted: Dict[int, bytes], skip: List[int] = ()):
+    """Write the output PDF, replacing inverted pages with their images.
+
+    Pages listed in skip are left out.
+    """
+    doc = fitz.open(input_path)
+    out_pdf = fitz.open()
+    skip = set(skip)
+
+    # Copy metadata
+    out_pdf.metadata = doc.metadata
+
+    page_num = 0
+    while page_num < doc.page_count:
+        if page_num in skip:
+            page_num += 1
+            continue
+
+        if page_num in inverted:
+            page = doc[page_num]
+            new_page = out_pdf.new_page(width=page.rect.width,
+                                        height=page.rect.height)
+            new_page.insert_image(page.rect,
+                                  stream=inverted[page_num],
+                                  keep_proportion=True)
+            page_num += 1
+            continue
+
+        # Copy runs of unchanged pages in one go
+        run_end = page_num
+        while run_end + 1 < doc.page_count and run_end + 1 not in inverted and run_end + 1 not in skip:
+            run_end += 1
+        out_pdf.insert_pdf(doc, from_page=page_num, to_page=run_end)
+        page_num = run_end + 1
+
+    # Save optimized PDF
+    out_pdf.save(output_path,
+                 garbage=4,
+                 deflate=True,
+                 clean=True,
+                 linear=True)
+
+    out_pdf.close()
+    doc.close()
+
+# Vector mode: invert colors in the content stream instead of rasterizing
+
+_NUMBER = rb"[-+]?(?:\d+\.\d*|\.\d+|\d+)"
+_OPERAND_END = rb"(?![^\s\[\]/<>()])"
+_COLOR_OP = re.compile(
+    # String literals are matched first so text inside them is left alone
+    rb"(?P<string>\((?:\\.|[^\\()])*\))"
+    rb"|(?<![^\s])(?P<numbers>(?:" + _NUMBER + rb"\s+){1,4})(?P<op>rg|RG|g|G|k|K|scn|SCN|sc|SC)" + _OPERAND_END +
+    rb"|(?P<space>/[^\s/\[\]<>()]+)\s+(?P<space_op>cs|CS)" + _OPERAND_END +
+    rb"|(?<![^\s])(?P<state>q|Q)" + _OPERAND_END
+)
+
+# Gray and RGB spaces, by number of components, can be inverted in place
+_GRAY, _RGB = 1, 3
+# Pattern colors are names, left alone
+_PATTERN = 0
+_DEVICE_SPACES = {
+    b"/DeviceGray": _GRAY, b"/CalGray": _GRAY,
+    b"/DeviceRGB": _RGB, b"/CalRGB": _RGB,
+    b"/Pattern": _PATTERN,
+}
+
+class UnsupportedColorSpace(Exception):
+    """Content sets colors in a space that can't be inverted component-wise."""
+
+def _fmt(value: float) -> bytes:
+    return (b"%.4f" % value).rstrip(b"0").rstrip(b".") or b"0"
+
+def _invert_values(numbers: List[bytes], needed: int) -> List[bytes]:
+    """Invert the last needed components, keeping any operands before them."""
+    values = [float(n) for n in numbers[-needed:]]
+    return numbers[:-needed] + [_fmt(1 - min(max(v, 0.0), 1.0)) for v in values]
+
+def invert_content_stream(stream: bytes, color_space=None) -> bytes:
+    """Invert fill and stroke colors set in a content stream.
+
+    sc/scn colors are only rewritten in Gray and RGB spaces (device,
+    calibrated or ICC based). color_space(name) gives the component count
+    of a named space from the resources, _PATTERN, or None for any other
+    space; colors set in those raise UnsupportedColorSpace.
+    """
+    # Default colors are black in DeviceGray, so start from white
+    spaces = [_GRAY, _GRAY]  # Fill, stroke
+    saved = []
+
+    def invert_op(match) -> bytes:
+        if match.group("string"):
+            return match.group(0)
+
+        if match.group("state"):
+            # q/Q save and restore the color spaces with the graphics state
+            if match.group("state") == b"q":
+                saved.append(list(spaces))
+            elif saved:
+                spaces[:] = saved.pop()
+            return match.group(0)
+
+        if match.group("space"):
+            name = match.group("space")
+            space = _DEVICE_SPACES.get(name, -1)
+            if space == -1:
+                space = color_space(name) if color_space else None
+            spaces[0 if match.group("space_op") == b"cs" else 1] = space
+            return match.group(0)
+
+        numbers = match.group("numbers").split()
+        op = match.group("op")
+        stroke = op.isupper()
+
+        if op in (b"k", b"K"):
+            if len(numbers) < 4:
+                return match.group(0)
+            # Convert CMYK to RGB first, then invert
+            c, m, y, k = [float(n) for n in numbers[-4:]]
+            rgb = [_fmt((1 - c) * (1 - k)), _fmt((1 - m) * (1 - k)), _fmt((1 - y) * (1 - k))]
+            spaces[stroke] = _RGB
+            return b" ".join(_invert_values(numbers[:-4] + rgb, 3) + [b"RG" if stroke else b"rg"])
+
+        if op.lower() in (b"g", b"rg"):
+            needed = _GRAY if op.lower() == b"g" else _RGB
+            spaces[stroke] = needed
+        else:
+            needed = spaces[stroke]
+            if needed is None:
+                raise UnsupportedColorSpace()
+            if needed == _PATTERN:
+                return match.group(0)
+        if len(numbers) < needed:
+            return match.group(0)
+        return b" ".join(_invert_values(numbers, needed) + [op])
+
+    return b"1 g 1 G\n" + _COLOR_OP.sub(invert_op, stream)
+
+def _resource(doc, xrefs: List[int], path: str) -> Tuple[str, str]:
+    """Look up a resource, trying each object's /Resources in turn.
+
+    Pages also inherit resources from their parents in the page tree.
+    """
+    for xref in xrefs:
+        while xref:
+            kind, value = doc.xref_get_key(xref, "Resources/" + path)
+            if kind != "null":
+                return kind, value
+            kind, value = doc.xref_get_key(xref, "Parent")
+            xref = int(value.split()[0]) if kind == "xref" else 0
+    return "null", "null"
+
+def _color_space_resolver(doc, xrefs: List[int]):
+    """color_space() for invert_content_stream from the resources of xrefs."""
+    def color_space(name: bytes):
+        kind, value = _resource(doc, xrefs, "ColorSpace/" + name[1:].decode("latin-1"))
+        if kind == "xref":
+            value = doc.xref_object(int(value.split()[0]), compressed=True)
+        if kind == "name":
+            return _DEVICE_SPACES.get(value.encode("latin-1"))
+
+        family = re.match(r"\[\s*(/\w+)(?:\s*(\d+) 0 R)?", value)
+        if not family:
+            return None
+        if family[1] == "/ICCBased" and family[2]:
+            components = doc.xref_get_key(int(family[2]), "N")[1]
+            return int(components) if components in ("1", "3") else None
+        return _DEVICE_SPACES.get(family[1].encode("latin-1"))
+    return color_space
+
+def is_scanned_page(page) -> bool:
+    """A page with images but no text or vector drawings."""
+    return (
+        not page.get_text("text").strip()
+        and not page.get_drawings()
+        and bool(page.get_images())
+    )
+
+def _invert_images(doc, page, done_xrefs: set):
+    """Invert the images embedded in a page."""
+    for image in page.get_images(full=True):
+        xref = image[0]
+        if xref in done_xrefs:
+            continue
+        done_xrefs.add(xref)
+        try:
+            pix = fitz.Pixmap(doc, xref)
+            if pix.colorspace and pix.colorspace.n not in (1, 3):
+                pix = fitz.Pixmap(fitz.csRGB, pix)
+            pix.invert_irect(pix.irect)
+            page.replace_image(xref, pixmap=pix)
+        except Exception as e:
+            print(f"Image invert error (xref {xref}): {str(e)}")
+
+def _page_xrefs(page) -> Set[int]:
+    """Content streams, Form XObjects and images a page draws from."""
+    xrefs = set(page.get_contents())
+    xrefs.update(xobject[0] for xobject in page.get_xobjects())
+    xrefs.update(image[0] for image in page.get_images(full=True))
+    return xrefs
+
+def _rewrite_vector_page(doc, page, light_xrefs: Set[int]) -> Optional[Dict[int, bytes]]:
+    """Inverted content streams of a page by xref, or None if it has to be
+    rasterized.
+
+    Streams and images also drawn by a light page (light_xrefs) would be
+    inverted there too, so such pages are rasterized instead.
+    """
+    page.clean_contents()
+    contents = page.get_contents()
+    if not contents or not light_xrefs.isdisjoint(_page_xrefs(page)):
+        return None
+
+    # Form XObjects hold their own content streams and resources, falling
+    # back to the page's
+    streams = [(xref, [page.xref]) for xref in contents]
+    for xobject in page.get_xobjects():
+        streams.append((xobject[0], [xobject[0], page.xref]))
+
+    rewritten = {}
+    for xref, resources in streams:
+        if xref in rewritten:
+            continue
+        stream = doc.xref_stream(xref)
+        # Inline image data can't be told apart from operators
+        if re.search(rb"(?<![^\s])BI\s", stream):
+            return None
+        try:
+            rewritten[xref] = invert_content_stream(stream, _color_space_resolver(doc, resources))
+        except UnsupportedColorSpace:
+            return None
+    return rewritten
+
+def vector_invert_document(input_path: str, output_path: str) -> Dict:
+    """Invert dark pages while keeping text and vector graphics.
+
+    Dark pages get their color operators and embedded images inverted.
+    Pure scans, and pages whose content can't be rewritten safely, fall
+    back to the raster path. Returns the inverted and rasterized page
+    numbers, and the scanned ones among all pages.
+    """
+    doc = fitz.open(input_path)
+    inverted = []
+    rasterized = []
+    done_xrefs = set()  # Shared streams and images are inverted once
+
+    dark_pages = [page.number for page in doc if is_dark_page(page)]
+    scanned = [page.number for page in doc if is_scanned_page(page)]
+    light_xrefs = set()  # Anything drawn on a light page must stay as is
+    for page_num in set(range(doc.page_count)) - set(dark_pages):
+        light_xrefs.update(_page_xrefs(doc[page_num]))
+
+    rewrites = {}
+    for page_num in dark_pages:
+        page = doc[page_num]
+        streams = None if page_num in scanned else _rewrite_vector_page(doc, page, light_xrefs)
+        if streams is None:
+            rasterized.append(page_num)
+        else:
+            rewrites[page_num] = streams
+
+    # Rasterize before changing anything, so pages sharing streams or
+    # images with a vector page are rendered from the original content
+    for page_num in rasterized:
+        page = doc[page_num]
+        rect = page.rect
+        image = render_inverted(page)
+        new_page = doc.new_page(pno=page_num, width=rect.width, height=rect.height)
+        new_page.insert_image(new_page.rect, stream=image, keep_proportion=True)
+        doc.delete_page(page_num + 1)
+
+    for page_num, streams in rewrites.items():
+        for xref, stream in streams.items():
+            if xref not in done_xrefs:
+                done_xrefs.add(xref)
+                doc.update_stream(xref, stream)
+        _invert_images(doc, doc[page_num], done_xrefs)
+        inverted.append(page_num)
+
+    doc.save(output_path,
+             garbage=4,
+             deflate=True,
+             clean=True)
+    doc.close()
+
+    return {'inverted': inverted, 'rasterized': rasterized, 'scanned': scanned}
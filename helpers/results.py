@@ -0,0 +1,76 @@
+from pyrogram.types import Message
+from motor.motor_asyncio import AsyncIOMotorClient
+from datetime import datetime
+from typing import List
+import hashlib
+import json
+import os
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# MongoDB setup
+mongo_client = AsyncIOMotorClient(os.getenv('MONGODB_URI'))
+db = mongo_client[os.getenv('DB_NAME')]
+results_collection = db['result_cache']
+
+# How long an uploaded result can be reused (seconds)
+RESULT_CACHE_TTL = int(os.getenv('RESULT_CACHE_TTL', 7 * 24 * 60 * 60))
+
+_index_ready = False
+
+def result_key(operation: str, inputs: List[str], **params) -> str:
+    """Build a cache key from the operation, its inputs and parameters."""
+    raw = json.dumps([operation, inputs, params], sort_keys=True)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+async def ensure_index():
+    """Create the TTL index that expires old results."""
+    global _index_ready
+    if _index_ready:
+        return
+    await results_collection.create_index("created_at", expireAfterSeconds=RESULT_CACHE_TTL)
+    _index_ready = True
+
+async def save_result(key: str, sent: Message, caption: str):
+    """Remember the Telegram file_id of an uploaded result."""
+    try:
+        if not sent or not sent.document:
+            return
+        await ensure_index()
+        await results_collection.update_one(
+            {"_id": key},
+            {"$set": {
+                "file_id": sent.document.file_id,
+                "file_name": sent.document.file_name,
+                "caption": caption,
+                "created_at": datetime.utcnow()
+            }},
+            upsert=True
+        )
+    except Exception as e:
+        print(f"Error saving result: {str(e)}")
+
+async def send_cached_result(message: Message, key: str) -> bool:
+    """Resend a previously uploaded result. Returns True if one was sent."""
+    try:
+        result = await results_collection.find_one({"_id": key})
+    except Exception as e:
+        print(f"Error reading result cache: {str(e)}")
+        return False
+
+    if not result:
+        return False
+
+    try:
+        await message.reply_document(
+            document=result["file_id"],
+            caption=result["caption"]
+        )
+        return True
+    except Exception as e:
+        # The file_id is no longer valid, process the request again
+        print(f"Cached result send error: {str(e)}")
+        await results_collection.delete_one({"_id": key})
+        return False
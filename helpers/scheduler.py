@@ -0,0 +1,153 @@
+from pyrogram.types import Message
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Optional
+import asyncio
+import os
+
+from .pool import WORKER_PROCESSES
+from .state import jobs, set_state, start_token, finish_token, IDLE, QUEUED, RUNNING
+from .progress import StatusMessage
+
+# Heavy jobs (/merge, /invert, /inverts, /pdf) running at once across all users
+MAX_HEAVY_JOBS = int(os.getenv('MAX_HEAVY_JOBS', WORKER_PROCESSES))
+# Light jobs (/pages, /price) running at once; they never wait for heavy ones
+MAX_LIGHT_JOBS = int(os.getenv('MAX_LIGHT_JOBS', 8))
+
+class QueuedJob:
+    def __init__(self, user_id: int, message: Message, name: str, run: Callable[[], Awaitable]):
+        self.user_id = user_id
+        self.message = message
+        self.name = name  # Command, e.g. "/invert"
+        self.run = run
+        self.status: Optional[StatusMessage] = None  # "position in queue" message
+        self.position = 0  # Position last shown to the user
+
+# Heavy jobs waiting for a slot, oldest first
+_queue: Deque[QueuedJob] = deque()
+# Running heavy jobs by user
+_running: Dict[int, asyncio.Task] = {}
+_light_semaphore = None
+
+def queue_text(position: int) -> str:
+    return (
+        "⏳ **আপনার কাজটি লাইনে আছে**\n\n"
+        f"• লাইনে আপনার অবস্থান: {position}\n"
+        f"• চলমান কাজ: {len(_running)}/{MAX_HEAVY_JOBS}\n\n"
+        "আগের কাজগুলো শেষ হলেই এটি নিজে থেকে শুরু হবে।\n"
+        "বাতিল করতে /allcancel দিন।"
+    )
+
+def has_heavy_job(user_id: int) -> bool:
+    """Whether the user has a heavy job running or waiting.
+
+    A /merge still collecting files counts too, so nothing else takes the
+    user's slot before the last file arrives.
+    """
+    job = jobs.get(user_id)
+    if job and job.merger and job.merger.collecting:
+        return True
+    return user_id in _running or any(job.user_id == user_id for job in _queue)
+
+async def run_heavy(message: Message, user_id: int, name: str, run: Callable[[], Awaitable]) -> bool:
+    """Queue a heavy job and return without waiting for it.
+
+    run is called once a slot is free. Each user gets at most one heavy
+    job; a second one is refused. Returns whether the job was accepted.
+    """
+    if has_heavy_job(user_id):
+        await message.reply_text(
+            "⏳ **আপনার একটি কাজ ইতিমধ্যে চলছে বা লাইনে আছে।**\n\n"
+            "সেটি শেষ হওয়া পর্যন্ত অপেক্ষা করুন অথবা /allcancel দিয়ে বাতিল করুন।"
+        )
+        return False
+    
+    job = QueuedJob(user_id, message, name, run)
+    _queue.append(job)
+    set_state(user_id, QUEUED)
+    _start_jobs()
+    
+    # Tell the user where they are if they have to wait
+    if job in _queue:
+        job.position = _queue.index(job) + 1
+        status = job.status = StatusMessage(message)
+        await status.show(queue_text(job.position))
+        if job not in _queue:
+            # Started or cancelled while the reply was being sent
+            await status.delete()
+        else:
+            _announce_positions()
+    return True
+
+async def run_light(user_id: int, name: str, run: Callable[[], Awaitable]):
+    """Run a light job now, limited only by the other light jobs."""
+    global _light_semaphore
+    if _light_semaphore is None:
+        _light_semaphore = asyncio.Semaphore(MAX_LIGHT_JOBS)
+    async with _light_semaphore:
+        # Run in a task of its own so /allcancel can cancel it without
+        # cancelling the handler that is waiting for it
+        await asyncio.wait([asyncio.create_task(_run_job(user_id, name, run))])
+
+async def cancel_queued(user_id: int) -> int:
+    """Drop a user's waiting heavy jobs. Returns how many were dropped."""
+    jobs = [job for job in _queue if job.user_id == user_id]
+    for job in jobs:
+        _queue.remove(job)
+        set_state(user_id, IDLE)
+        await _delete_status(job)
+    if jobs:
+        _announce_positions()
+    return len(jobs)
+
+def _start_jobs():
+    """Start queued jobs while there are free slots."""
+    started = False
+    while _queue and len(_running) < MAX_HEAVY_JOBS:
+        job = _queue.popleft()
+        set_state(job.user_id, RUNNING)
+        _running[job.user_id] = asyncio.create_task(_run(job))
+        started = True
+    if started and _queue:
+        _announce_positions()
+
+async def _run(job: QueuedJob):
+    async def run():
+        await _delete_status(job)
+        await job.run()
+    
+    try:
+        # The token is registered before the first await, so /allcancel
+        # also stops a job that is still removing its queue message
+        await _run_job(job.user_id, job.name, run)
+    finally:
+        _running.pop(job.user_id, None)
+        set_state(job.user_id, IDLE)
+        _start_jobs()
+
+async def _run_job(user_id: int, name: str, run: Callable[[], Awaitable]):
+    """Run a job with a cancel token that /allcancel can use to stop it."""
+    token = start_token(user_id, name)
+    try:
+        await run()
+    except asyncio.CancelledError:
+        if not token.cancelled:
+            raise
+    except Exception as e:
+        print(f"Job error: {str(e)}")
+    finally:
+        finish_token(user_id, token)
+
+async def _delete_status(job: QueuedJob):
+    if job.status:
+        status, job.status = job.status, None
+        await status.delete()
+
+def _announce_positions():
+    """Update the position shown to every waiting user that moved up.
+
+    The edits are coalesced and rate limited like any other status.
+    """
+    for position, job in enumerate(_queue, 1):
+        if job.status and job.position != position:
+            job.position = position
+            job.status.report(queue_text(position))
@@ -0,0 +1,133 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+from typing import Dict, List
+import humanize
+
+# Where jobs keep their temporary files
+SCRATCH_DIR = os.getenv('SCRATCH_DIR', os.path.join(tempfile.gettempdir(), 'pdf_scratch'))
+# Optional fast (e.g. tmpfs like /dev/shm) directory for small jobs
+SCRATCH_FAST_DIR = os.getenv('SCRATCH_FAST_DIR', '')
+SCRATCH_FAST_MAX_JOB = int(os.getenv('SCRATCH_FAST_MAX_JOB', 64)) * 1024 * 1024  # MB
+# Space one job and all jobs together may claim
+SCRATCH_JOB_QUOTA = int(os.getenv('SCRATCH_JOB_QUOTA', 2560)) * 1024 * 1024  # MB
+SCRATCH_MAX_SIZE = int(os.getenv('SCRATCH_MAX_SIZE', 6144)) * 1024 * 1024  # MB
+# Job directories untouched this long are removed even if a job still owns them
+SCRATCH_MAX_AGE = int(os.getenv('SCRATCH_MAX_AGE', 6 * 60 * 60))
+SWEEP_INTERVAL = 10 * 60  # Seconds between sweeps
+# Job directory names start with this; the sweeper touches nothing else
+JOB_PREFIX = "job_"
+
+class ScratchFull(Exception):
+    """Not enough scratch space for a job."""
+
+# Bytes claimed by each live job directory
+_reserved: Dict[str, int] = {}
+_sweeper = None
+
+def create_scratch_dir(size_hint: int = 0) -> str:
+    """Create a temporary directory for a job.
+
+    Jobs expected to need at most SCRATCH_FAST_MAX_JOB bytes go to
+    SCRATCH_FAST_DIR when one is set and has room.
+    """
+    global _sweeper
+    root = SCRATCH_DIR
+    if SCRATCH_FAST_DIR and 0 < size_hint <= SCRATCH_FAST_MAX_JOB:
+        try:
+            os.makedirs(SCRATCH_FAST_DIR, exist_ok=True)
+            if shutil.disk_usage(SCRATCH_FAST_DIR).free > size_hint * 2:
+                root = SCRATCH_FAST_DIR
+        except OSError as e:
+            print(f"Fast scratch error: {str(e)}")
+
+    os.makedirs(root, exist_ok=True)
+    path = tempfile.mkdtemp(prefix=JOB_PREFIX, dir=root)
+    _reserved[path] = 0
+
+    if _sweeper is None:
+        try:
+            _sweeper = asyncio.get_running_loop().create_task(sweep_periodically())
+        except RuntimeError:
+            pass  # No event loop (e.g. in a worker process)
+    return path
+
+def reserve_scratch(path: str, size: int):
+    """Claim size bytes in a job directory before writing them.
+
+    Raises ScratchFull if the job or the bot as a whole would go over its
+    quota, or the disk doesn't have the room.
+    """
+    used = _reserved.get(path, 0)
+    if used + size > SCRATCH_JOB_QUOTA:
+        raise ScratchFull(
+            f"একটি কাজে সর্বোচ্চ {humanize.naturalsize(SCRATCH_JOB_QUOTA)} জায়গা ব্যবহার করা যাবে।"
+        )
+    if sum(_reserved.values()) + size > SCRATCH_MAX_SIZE or shutil.disk_usage(path).free < size:
+        raise ScratchFull("সার্ভারে এখন যথেষ্ট জায়গা নেই। কিছুক্ষণ পর আবার চেষ্টা করুন।")
+    _reserved[path] = used + size
+
+def free_scratch(path: str, size: int):
+    """Give back space claimed for a file that has been deleted."""
+    if path in _reserved:
+        _reserved[path] = max(0, _reserved[path] - size)
+
+def release_scratch(path: str):
+    """Remove a job directory and give back its space."""
+    _reserved.pop(path, None)
+    shutil.rmtree(path, ignore_errors=True)
+
+def scratch_usage() -> int:
+    """Bytes claimed by all live jobs."""
+    return sum(_reserved.values())
+
+def find_orphans() -> List[str]:
+    """Job directories no live job owns, or that were abandoned."""
+    now = time.time()
+    orphans = []
+    for root in filter(None, {SCRATCH_DIR, SCRATCH_FAST_DIR}):
+        try:
+            names = os.listdir(root)
+        except FileNotFoundError:
+            continue
+        for name in names:
+            # The roots may be shared (e.g. /tmp or /dev/shm), leave other files alone
+            if not name.startswith(JOB_PREFIX):
+                continue
+            path = os.path.join(root, name)
+            try:
+                if not os.path.isdir(path):
+                    continue
+                if path in _reserved and now - os.path.getmtime(path) < SCRATCH_MAX_AGE:
+                    continue
+            except OSError:
+                continue
+            orphans.append(path)
+    return orphans
+
+def _remove_dirs(paths: List[str]):
+    for path in paths:
+        shutil.rmtree(path, ignore_errors=True)
+
+def sweep_scratch():
+    """Remove job directories no live job owns, or that were abandoned."""
+    paths = find_orphans()
+    for path in paths:
+        _reserved.pop(path, None)
+    _remove_dirs(paths)
+
+async def sweep_periodically():
+    """Sweep the scratch directories every SWEEP_INTERVAL seconds."""
+    while True:
+        await asyncio.sleep(SWEEP_INTERVAL)
+        try:
+            # Book-keeping stays on the event loop, only the deleting
+            # happens in a thread
+            paths = find_orphans()
+            for path in paths:
+                _reserved.pop(path, None)
+            await asyncio.get_running_loop().run_in_executor(None, _remove_dirs, paths)
+        except Exception as e:
+            print(f"Scratch sweep error: {str(e)}")
@@ -1,19 +1,55 @@
 from pyrogram.types import Message
 import asyncio
-from typing import Dict, List
-import tempfile
+from collections.abc import MutableMapping
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+import time
 import os
 
+from .scratch import create_scratch_dir, release_scratch
+
+# Jobs untouched for this many seconds are evicted (unless running)
+JOB_TTL = int(os.getenv('JOB_TTL', 60 * 60))
+REAPER_INTERVAL = 60  # Seconds between reaper runs
+
 class PDFMerger:
     def __init__(self):
         self.pdf_files: List[Dict] = []  # Store file info
         self.required_files: int = 0
-        self.temp_dir = tempfile.mkdtemp()
+        self._temp_dir: Optional[str] = None
         self.collecting = False
         self.downloaded_files: List[str] = []  # Track downloaded files
+        self.tasks: List[asyncio.Task] = []  # Background downloads and workers
+        self.download_progress: Dict[int, int] = {}  # Bytes received per file
+        self.download_semaphore = None
+        self.download_start = None
+        self.merge_task = None  # Merge running in a worker process
+    
+    @property
+    def temp_dir(self) -> str:
+        """Scratch directory for this merger, created on first use."""
+        if self._temp_dir is None:
+            self._temp_dir = create_scratch_dir()
+        return self._temp_dir
+    
+    def track(self, coro) -> asyncio.Task:
+        """Run a coroutine as a task that reset() cancels."""
+        task = asyncio.create_task(coro)
+        self.tasks.append(task)
+        return task
     
     def reset(self):
         """Reset the merger state and clean temporary files."""
+        self.close()
+    
+    def close(self):
+        """Stop all work and remove temporary files for good."""
+        # Stop background downloads and kill running workers
+        for task in self.tasks:
+            task.cancel()
+        if self.merge_task:
+            self.merge_task.cancel()
+        
         # Clean downloaded files
         for file_path in self.downloaded_files:
             try:
@@ -22,26 +58,220 @@ class PDFMerger:
             except:
                 pass
         
-        # Clean temp directory
-        try:
-            if os.path.exists(self.temp_dir):
-                for file in os.listdir(self.temp_dir):
-                    try:
-                        os.remove(os.path.join(self.temp_dir, file))
-                    except:
-                        pass
-                os.rmdir(self.temp_dir)
-        except:
-            pass
-            
+        # Clean temp directory; a new one is made if the merger is used again
+        if self._temp_dir:
+            release_scratch(self._temp_dir)
+            self._temp_dir = None
+        
         self.pdf_files = []
         self.downloaded_files = []
+        self.tasks = []
+        self.download_progress = {}
+        self.merge_task = None
         self.required_files = 0
         self.collecting = False
-        self.temp_dir = tempfile.mkdtemp()
 
-# Global state
-user_states: Dict[int, PDFMerger] = {}
-status_messages: Dict[int, Message] = {}
-message_locks: Dict[int, asyncio.Lock] = {}
-last_progress_update: Dict[int, float] = {} 
\ No newline at end of file
+class CancelToken:
+    """Cancellation handle for one command run.
+
+    Worker processes started while the command runs (including from
+    tasks it creates) register themselves here, so cancel() can kill
+    them at once instead of waiting for the cancellation to reach them.
+    """
+    __slots__ = ('name', 'task', 'processes', 'cancelled')
+    
+    def __init__(self, name: str, task: asyncio.Task):
+        self.name = name  # Command, e.g. "/invert"
+        self.task = task
+        self.processes = set()
+        self.cancelled = False
+    
+    def cancel(self) -> int:
+        """Kill the worker processes and cancel the task. Returns the number of processes killed."""
+        self.cancelled = True
+        killed = 0
+        for process in list(self.processes):
+            if process.is_alive():
+                process.kill()
+                killed += 1
+        self.task.cancel()
+        return killed
+
+# Token of the command the running code belongs to
+current_token: ContextVar[Optional[CancelToken]] = ContextVar('current_token', default=None)
+
+# Job lifecycle states
+IDLE = "idle"  # Nothing running, e.g. a /merge waiting for files
+QUEUED = "queued"  # Waiting for a scheduler slot
+RUNNING = "running"
+
+class Job:
+    """Everything the bot keeps about one user's current work."""
+    __slots__ = (
+        'user_id', 'state', 'merger', 'status_message', 'lock', 'last_progress', 'tokens', 'touched',
+        'status_sent', 'pending_status', 'status_task', 'postponed_until'
+    )
+    
+    def __init__(self, user_id: int):
+        self.user_id = user_id
+        self.state = IDLE
+        self.merger: Optional[PDFMerger] = None
+        self.status_message: Optional[Message] = None
+        self.lock: Optional[asyncio.Lock] = None
+        self.last_progress: Optional[float] = None  # Time of the last progress edit
+        self.tokens: List[CancelToken] = []  # Commands running for this user
+        self.touched = time.time()  # Last time anything changed
+        # Status message bookkeeping for helpers/progress.py
+        self.status_sent = None  # (message, text) last shown
+        self.pending_status = None  # (message, text) waiting to be shown
+        self.status_task: Optional[asyncio.Task] = None  # Shows pending_status
+        self.postponed_until = 0.0  # No edits before this time (FloodWait)
+    
+    def is_empty(self) -> bool:
+        return (
+            self.state == IDLE and self.merger is None and self.status_message is None
+            and self.lock is None and self.last_progress is None and not self.tokens
+        )
+
+# Live jobs by user
+jobs: Dict[int, Job] = {}
+_reaper = None
+
+def get_job(user_id: int) -> Job:
+    """Get the user's job, creating it if needed."""
+    global _reaper
+    job = jobs.get(user_id)
+    if job is None:
+        job = jobs[user_id] = Job(user_id)
+        if _reaper is None:
+            _reaper = asyncio.get_running_loop().create_task(reap_jobs())
+    job.touched = time.time()
+    return job
+
+def set_state(user_id: int, state: str):
+    """Move a user's job to a new lifecycle state."""
+    job = get_job(user_id)
+    job.state = state
+    if job.is_empty():
+        del jobs[user_id]
+
+def job_counts() -> Dict[str, int]:
+    """Number of live jobs in each state; idle /merge jobs waiting for files count as "collecting"."""
+    counts = {IDLE: 0, QUEUED: 0, RUNNING: 0, "collecting": 0}
+    for job in jobs.values():
+        if job.state == IDLE and job.merger and job.merger.collecting:
+            counts["collecting"] += 1
+        else:
+            counts[job.state] += 1
+    return counts
+
+def start_token(user_id: int, name: str) -> CancelToken:
+    """Register the current task as a command run by the user."""
+    token = CancelToken(name, asyncio.current_task())
+    current_token.set(token)
+    get_job(user_id).tokens.append(token)
+    return token
+
+def finish_token(user_id: int, token: CancelToken):
+    job = jobs.get(user_id)
+    if job and token in job.tokens:
+        job.tokens.remove(token)
+        if job.is_empty():
+            del jobs[user_id]
+
+def cancel_job(user_id: int) -> Dict:
+    """Stop everything the user has running and remove its temp files now.
+
+    Returns what was stopped: command names, worker processes killed and
+    background tasks (downloads, workers) cancelled.
+    """
+    stopped = {"commands": [], "processes": 0, "tasks": 0}
+    job = jobs.get(user_id)
+    if job is None:
+        return stopped
+    
+    for token in job.tokens:
+        # Don't cancel the command asking for the cancellation
+        if token is current_token.get() or token.cancelled:
+            continue
+        stopped["commands"].append(token.name)
+        stopped["processes"] += token.cancel()
+    
+    if job.merger:
+        if job.merger.collecting:
+            stopped["commands"].append("/merge")
+        stopped["tasks"] += sum(1 for task in job.merger.tasks if not task.done())
+        if job.merger.merge_task and not job.merger.merge_task.done():
+            stopped["tasks"] += 1
+        job.merger.close()
+    return stopped
+
+async def evict_job(job: Job):
+    """Drop an abandoned job and free everything it holds."""
+    jobs.pop(job.user_id, None)
+    if job.merger:
+        collecting = job.merger.collecting
+        job.merger.close()
+        if collecting and job.status_message:
+            try:
+                await job.status_message.edit_text(
+                    "⌛ **সময় শেষ!**\n\n"
+                    "অনেকক্ষণ কোনো ফাইল না আসায় /merge বাতিল করা হয়েছে।\n"
+                    "আবার শুরু করতে /merge দিন।"
+                )
+            except:
+                pass
+
+async def reap_jobs():
+    """Evict jobs that have been idle for longer than JOB_TTL."""
+    while True:
+        await asyncio.sleep(REAPER_INTERVAL)
+        try:
+            deadline = time.time() - JOB_TTL
+            for job in list(jobs.values()):
+                if job.state == IDLE and job.touched < deadline:
+                    await evict_job(job)
+        except Exception as e:
+            print(f"Job reaper error: {str(e)}")
+
+class JobField(MutableMapping):
+    """Dict-like view of one Job attribute for every user.
+
+    Lets code keep writing user_states[user_id] and friends while the
+    data lives in the job registry. Deleting the last field of an idle
+    job removes the job.
+    """
+    
+    def __init__(self, field: str):
+        self.field = field
+    
+    def __getitem__(self, user_id: int):
+        job = jobs.get(user_id)
+        value = getattr(job, self.field) if job else None
+        if value is None:
+            raise KeyError(user_id)
+        return value
+    
+    def __setitem__(self, user_id: int, value):
+        setattr(get_job(user_id), self.field, value)
+    
+    def __delitem__(self, user_id: int):
+        job = jobs.get(user_id)
+        if job is None or getattr(job, self.field) is None:
+            raise KeyError(user_id)
+        setattr(job, self.field, None)
+        job.touched = time.time()
+        if job.is_empty():
+            del jobs[user_id]
+    
+    def __iter__(self):
+        return iter([user_id for user_id, job in jobs.items() if getattr(job, self.field) is not None])
+    
+    def __len__(self) -> int:
+        return sum(1 for job in jobs.values() if getattr(job, self.field) is not None)
+
+# Per-user views of the job registry
+user_states = JobField('merger')
+status_messages = JobField('status_message')
+message_locks = JobField('lock')
+last_progress_update = JobField('last_progress') 
\ No newline at end of file
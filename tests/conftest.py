@@ -0,0 +1,9 @@
+import os
+import sys
+
+# Let the tests import helpers/ without installing the bot
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# helpers/results.py opens its Motor handle at import; nothing here connects
+os.environ.setdefault("MONGODB_URI", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "pdf_helper_bot_test")
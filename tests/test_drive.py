@@ -0,0 +1,227 @@
+"""Drive fetcher against a local stand-in for the Drive viewer (DRIVE_BASE_URL)."""
+import asyncio
+import io
+
+import pytest
+
+pytest.importorskip("pyrogram")
+pytest.importorskip("motor")
+fitz = pytest.importorskip("fitz")
+from aiohttp import web
+from PIL import Image
+
+from helpers import drive
+from helpers.imagepdf import StreamingPDFWriter
+
+def page_image(page: int, width: int) -> bytes:
+    """A PNG whose height tells the page number."""
+    out = io.BytesIO()
+    Image.new("RGB", (width, 10 * (page + 1)), "white").save(out, format="PNG")
+    return out.getvalue()
+
+class StandIn:
+    """Serves page images, failing requests as told by responses.
+
+    responses maps a page to the statuses its first requests get, e.g.
+    {0: [429, 503]} makes page 0 succeed on the third try.
+    """
+
+    def __init__(self, pages: int, responses=None, delays=None):
+        self.pages = pages
+        self.responses = {page: list(statuses) for page, statuses in (responses or {}).items()}
+        self.delays = delays or {}  # Seconds before answering, by page
+        self.requests = []  # Pages in the order they were requested
+        self.done = {}  # Page -> requests seen when it was answered
+        self.active = 0
+        self.max_active = 0
+
+    async def image(self, request):
+        page = int(request.query["page"])
+        self.requests.append(page)
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.delays.get(page, 0))
+            statuses = self.responses.get(page)
+            if statuses:
+                return web.Response(status=statuses.pop(0))
+            if page >= self.pages:
+                return web.Response(status=404)
+            self.done.setdefault(page, list(self.requests))
+            return web.Response(body=page_image(page, int(request.query["w"])), content_type="image/png")
+        finally:
+            self.active -= 1
+
+    async def meta(self, request):
+        return web.Response(text=f'{{"pages": {self.pages}}}')
+
+async def serve(stand_in: StandIn):
+    app = web.Application()
+    app.router.add_get("/viewer2/prod-01/img", stand_in.image)
+    app.router.add_get("/viewer2/prod-01/meta", stand_in.meta)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    host, port = runner.addresses[0][:2]
+    return runner, f"http://{host}:{port}"
+
+@pytest.fixture
+def run(monkeypatch):
+    """Run a test coroutine against a stand-in, without the page cache."""
+    monkeypatch.setattr(drive, "read_cached_page", lambda *args: None)
+    monkeypatch.setattr(drive, "store_cached_page", lambda *args: None)
+    monkeypatch.setattr(drive, "evict_drive_cache", lambda: None)
+    monkeypatch.setattr(drive, "RETRY_MAX_DELAY", 0)
+    monkeypatch.setattr(drive.random, "random", lambda: 0)
+
+    def run(stand_in: StandIn, test):
+        async def main():
+            runner, url = await serve(stand_in)
+            monkeypatch.setattr(drive, "DRIVE_BASE_URL", url)
+            try:
+                return await test()
+            finally:
+                await (await drive.get_session()).close()
+                await runner.cleanup()
+        return asyncio.run(main())
+    return run
+
+def test_limiter_halves_on_backoff_and_grows_after_a_window():
+    limiter = drive.AdaptiveLimiter(8, 1, 10)
+    limiter.on_backoff()
+    assert limiter.limit == 4
+    for _ in range(3):
+        limiter.on_success()
+    assert limiter.limit == 4
+    limiter.on_success()
+    assert limiter.limit == 5
+    for _ in range(5):
+        limiter.on_backoff()
+    assert limiter.limit == 1
+
+def test_limiter_caps_concurrency():
+    limiter = drive.AdaptiveLimiter(3, 1, 3)
+    active = []
+
+    async def task():
+        async with limiter:
+            active.append(limiter.active)
+            await asyncio.sleep(0.01)
+
+    async def main():
+        await asyncio.gather(*(task() for _ in range(10)))
+
+    asyncio.run(main())
+    assert max(active) == 3
+
+def test_fetch_page_backs_off_on_429_and_5xx(run):
+    stand_in = StandIn(1, responses={0: [429, 503]})
+    limiter = drive.AdaptiveLimiter(4, 1, 8)
+
+    async def test():
+        return await drive.fetch_page(await drive.get_session(), limiter, "token", 0)
+
+    assert run(stand_in, test) == page_image(0, drive.PAGE_WIDTH)
+    assert stand_in.requests == [0, 0, 0]
+    # 4 -> 2 -> 1 on the failures, then a full window of one success
+    assert limiter.limit == 2
+
+def test_fetch_page_missing_page_is_not_retried(run):
+    stand_in = StandIn(1)
+    limiter = drive.AdaptiveLimiter(4, 1, 8)
+
+    async def test():
+        return await drive.fetch_page(await drive.get_session(), limiter, "token", 5)
+
+    assert run(stand_in, test) is None
+    assert stand_in.requests == [5]
+    assert limiter.limit == 4
+
+def test_fetch_page_gives_up_after_retries(run, monkeypatch):
+    monkeypatch.setattr(drive, "PAGE_RETRIES", 2)
+    stand_in = StandIn(1, responses={0: [500] * 10})
+
+    async def test():
+        await drive.fetch_page(await drive.get_session(), drive.AdaptiveLimiter(4, 1, 8), "token", 0)
+
+    with pytest.raises(Exception):
+        run(stand_in, test)
+    assert stand_in.requests == [0, 0, 0]
+
+def test_page_count_from_meta_and_probing(run):
+    stand_in = StandIn(13)
+
+    async def test():
+        session = await drive.get_session()
+        meta = await drive.fetch_page_count(session, "token")
+        probed, found = await drive.probe_page_count(session, drive.AdaptiveLimiter(4, 1, 8), "id", "token")
+        return meta, probed, found
+
+    meta, probed, found = run(stand_in, test)
+    assert meta == 13
+    assert probed == 13
+    assert all(page < 13 for page in found)
+
+def test_download_pages_keeps_order_through_failures(run, tmp_path):
+    pages = 30
+    stand_in = StandIn(pages, responses={3: [429], 7: [502, 503], 12: [429]}, delays={0: 0.2, 5: 0.1})
+    path = str(tmp_path / "out.pdf")
+    sizes = []
+
+    async def on_page(size):
+        sizes.append(size)
+
+    async def test():
+        writer = StreamingPDFWriter(path)
+        await drive.download_pages("id", "token", writer, pages, on_page)
+        writer.close()
+
+    run(stand_in, test)
+    assert len(sizes) == pages
+    doc = fitz.open(path)
+    heights = [page.rect.height for page in doc]
+    doc.close()
+    assert len(heights) == pages
+    # Page n is 10 * (n + 1) pixels high
+    assert all(abs(height / heights[0] - (page + 1)) < 0.01 for page, height in enumerate(heights))
+
+def test_download_pages_limits_reorder_window(run, monkeypatch, tmp_path):
+    monkeypatch.setattr(drive, "DRIVE_INITIAL_CONCURRENCY", 2)
+    monkeypatch.setattr(drive, "DRIVE_MAX_CONCURRENCY", 2)
+    stand_in = StandIn(20, delays={0: 0.3})
+
+    async def on_page(size):
+        pass
+
+    async def test():
+        writer = StreamingPDFWriter(str(tmp_path / "out.pdf"))
+        await drive.download_pages("id", "token", writer, 20, on_page)
+        writer.close()
+
+    run(stand_in, test)
+    # With a limit of 2 no page 4 or more ahead of page 0 starts before it's in
+    assert max(stand_in.done[0]) < 4
+    assert stand_in.max_active <= 2
+
+def test_quality_tiers_keep_page_size(run, tmp_path):
+    stand_in = StandIn(2)
+
+    async def on_page(size):
+        pass
+
+    async def convert(tier):
+        width, quality = drive.QUALITY_TIERS[tier]
+        writer = StreamingPDFWriter(str(tmp_path / f"{tier}.pdf"))
+        await drive.download_pages("id", "token", writer, 2, on_page, width=width, quality=quality)
+        writer.close()
+        doc = fitz.open(str(tmp_path / f"{tier}.pdf"))
+        size = (doc[0].rect.width, doc[0].rect.height)
+        doc.close()
+        return size
+
+    async def test():
+        return [await convert(tier) for tier in drive.QUALITY_TIERS]
+
+    sizes = run(stand_in, test)
+    assert all(abs(width - sizes[0][0]) < 0.5 for width, _ in sizes)
@@ -0,0 +1,68 @@
+"""The streaming JPEG-to-PDF writer, checked by opening its output with PyMuPDF."""
+import io
+
+import pytest
+
+fitz = pytest.importorskip("fitz")
+from PIL import Image
+
+from helpers.imagepdf import StreamingPDFWriter, to_jpeg, DEFAULT_DPI
+
+def image_bytes(mode: str, size, color, format: str) -> bytes:
+    out = io.BytesIO()
+    Image.new(mode, size, color).save(out, format=format)
+    return out.getvalue()
+
+def test_jpeg_is_embedded_unchanged():
+    data = image_bytes("RGB", (40, 30), (200, 10, 10), "JPEG")
+    assert to_jpeg(data) == (data, 40, 30, "RGB")
+
+def test_gray_image_stays_gray():
+    _, width, height, mode = to_jpeg(image_bytes("L", (20, 10), 128, "PNG"))
+    assert (width, height, mode) == (20, 10, "L")
+
+def test_transparency_is_flattened_onto_white():
+    data, _, _, mode = to_jpeg(image_bytes("RGBA", (10, 10), (0, 0, 0, 0), "PNG"))
+    assert mode == "RGB"
+    with Image.open(io.BytesIO(data)) as img:
+        assert min(img.getpixel((5, 5))) > 245
+
+def test_writer_output_opens_cleanly(tmp_path):
+    path = str(tmp_path / "out.pdf")
+    pages = [
+        to_jpeg(image_bytes("RGB", (96, 192), (255, 0, 0), "PNG")),
+        to_jpeg(image_bytes("L", (192, 96), 50, "PNG")),
+        to_jpeg(image_bytes("RGB", (300, 300), (0, 0, 255), "WEBP")),
+    ]
+    writer = StreamingPDFWriter(path)
+    for page in pages[:2]:
+        writer.add_jpeg(*page)
+    writer.add_jpeg(*pages[2], dpi=DEFAULT_DPI * 2)
+    writer.close()
+    assert writer.page_count == 3
+
+    fitz.TOOLS.mupdf_warnings()
+    doc = fitz.open(path)
+    assert not doc.is_repaired
+    assert doc.page_count == 3
+    # At 96 DPI a pixel is 0.75 points, at twice that 0.375
+    sizes = [(page.rect.width, page.rect.height) for page in doc]
+    assert sizes == [(72, 144), (144, 72), (112.5, 112.5)]
+
+    for number, (data, width, height, mode) in enumerate(pages):
+        images = doc[number].get_images(full=True)
+        assert len(images) == 1
+        extracted = doc.extract_image(images[0][0])
+        assert extracted["image"] == data
+        assert (extracted["width"], extracted["height"]) == (width, height)
+        assert extracted["colorspace"] == (1 if mode == "L" else 3)
+    doc.close()
+    assert not fitz.TOOLS.mupdf_warnings()
+
+def test_abort_leaves_no_finished_pdf(tmp_path):
+    path = str(tmp_path / "out.pdf")
+    writer = StreamingPDFWriter(path)
+    writer.add_jpeg(*to_jpeg(image_bytes("RGB", (10, 10), (0, 0, 0), "PNG")))
+    writer.abort()
+    with open(path, "rb") as f:
+        assert b"startxref" not in f.read()
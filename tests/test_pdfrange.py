@@ -0,0 +1,133 @@
+"""Range reads of page 1 and the page count, compared against PyMuPDF."""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("pyrogram")
+fitz = pytest.importorskip("fitz")
+
+from helpers import pdfrange
+
+PAGES = 12
+
+class FakeClient:
+    """Serves a file in CHUNK_SIZE chunks the way stream_media does."""
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.chunks = []  # Chunk indexes fetched
+
+    async def stream_media(self, message, limit: int, offset: int):
+        self.chunks.append(offset)
+        size = pdfrange.CHUNK_SIZE
+        for index in range(offset, offset + limit):
+            chunk = self.data[index * size:(index + 1) * size]
+            if chunk:
+                yield chunk
+
+def make_doc(pages: int = PAGES):
+    """A PDF with text, a drawing and a different size on every page."""
+    doc = fitz.open()
+    for number in range(pages):
+        page = doc.new_page(width=400 + 10 * number, height=600)
+        page.insert_text((50, 80), f"Page {number + 1}\n" + "line of text\n" * 20, fontsize=11)
+        page.draw_rect(fitz.Rect(50, 400, 200, 500), color=(1, 0, 0), fill=(0, 0, 1))
+    return doc
+
+@pytest.fixture
+def xref_table(tmp_path):
+    path = tmp_path / "table.pdf"
+    doc = make_doc()
+    doc.save(str(path), garbage=1)
+    doc.close()
+    assert b"\nxref" in path.read_bytes()
+    return path
+
+@pytest.fixture
+def xref_stream(tmp_path):
+    """Objects packed into object streams, indexed by an xref stream."""
+    path = tmp_path / "stream.pdf"
+    doc = make_doc()
+    doc.save(str(path), garbage=1, deflate=True, use_objstms=True)
+    doc.close()
+    data = path.read_bytes()
+    assert b"/ObjStm" in data and b"\nxref" not in data
+    return path
+
+def add_pages_incrementally(path):
+    doc = fitz.open(str(path))
+    page = doc.new_page(width=300, height=300)
+    page.insert_text((50, 80), "Added later")
+    doc.move_page(doc.page_count - 1, 0)  # New page 1, so it must come from the update
+    doc.save(str(path), incremental=True, encryption=fitz.PDF_ENCRYPT_KEEP)
+    doc.close()
+    assert b"/Prev" in path.read_bytes()
+    return path
+
+@pytest.fixture
+def incremental(xref_table):
+    """An xref table with an update appended after it."""
+    return add_pages_incrementally(xref_table)
+
+@pytest.fixture
+def incremental_stream(xref_stream):
+    """An xref stream with an update appended after it."""
+    return add_pages_incrementally(xref_stream)
+
+@pytest.fixture(autouse=True)
+def small_chunks(monkeypatch):
+    # Small chunks so the fixtures span many of them
+    monkeypatch.setattr(pdfrange, "CHUNK_SIZE", 256)
+    monkeypatch.setattr(pdfrange, "RANGE_READ_MAX_CHUNKS", 256)
+
+def message_for(data: bytes):
+    return SimpleNamespace(document=SimpleNamespace(file_size=len(data)))
+
+def expected(path):
+    doc = fitz.open(str(path))
+    count = doc.page_count
+    pix = doc[0].get_pixmap(matrix=fitz.Matrix(0.5, 0.5))
+    doc.close()
+    return count, pix
+
+FIXTURES = ["xref_table", "xref_stream", "incremental", "incremental_stream"]
+
+@pytest.mark.parametrize("fixture", FIXTURES)
+def test_page_count_matches_pymupdf(fixture, request):
+    path = request.getfixturevalue(fixture)
+    data = path.read_bytes()
+    client = FakeClient(data)
+    count = asyncio.run(pdfrange.read_page_count(client, message_for(data)))
+    assert count == expected(path)[0]
+    # Only the cross-reference data and page tree root were read
+    assert len(client.chunks) < len(data) // pdfrange.CHUNK_SIZE / 2
+
+@pytest.mark.parametrize("fixture", FIXTURES)
+def test_first_page_matches_pymupdf(fixture, request):
+    path = request.getfixturevalue(fixture)
+    data = path.read_bytes()
+    count, pix = asyncio.run(pdfrange.read_first_page(FakeClient(data), message_for(data)))
+    expected_count, expected_pix = expected(path)
+    assert count == expected_count
+    assert (pix.width, pix.height) == (expected_pix.width, expected_pix.height)
+    assert pix.samples == expected_pix.samples
+
+def test_incremental_update_is_read(incremental):
+    data = incremental.read_bytes()
+    assert data.count(b"startxref") == 2
+    count, pix = asyncio.run(pdfrange.read_first_page(FakeClient(data), message_for(data)))
+    assert count == PAGES + 1
+    # The page added by the update is 300 x 300 points
+    assert (pix.width, pix.height) == (150, 150)
+
+def test_too_many_chunks_falls_back(xref_table, monkeypatch):
+    monkeypatch.setattr(pdfrange, "RANGE_READ_MAX_CHUNKS", 1)
+    data = xref_table.read_bytes()
+    with pytest.raises(pdfrange.RangeReadError):
+        asyncio.run(pdfrange.read_first_page(FakeClient(data), message_for(data)))
+
+def test_truncated_file_falls_back(xref_table):
+    data = xref_table.read_bytes()[:-200]
+    with pytest.raises(pdfrange.RangeReadError):
+        asyncio.run(pdfrange.read_page_count(FakeClient(data), message_for(data)))
@@ -0,0 +1,50 @@
+"""Blank page detection: text counts against the same ink threshold as images and drawings."""
+import io
+
+import pytest
+
+fitz = pytest.importorskip("fitz")
+from PIL import Image
+
+from helpers.render import is_empty_page, text_coverage, EMPTY_CONTENT_RATIO
+
+def new_page():
+    doc = fitz.open()
+    return doc, doc.new_page(width=595, height=842)
+
+def test_blank_page_is_empty():
+    doc, page = new_page()
+    assert is_empty_page(page)
+
+def test_short_title_is_empty():
+    # Well over any character count, still a tiny share of the page
+    doc, page = new_page()
+    page.insert_text((50, 80), "Chapter 12: Notes on the appendix", fontsize=9)
+    assert len(page.get_text("text").strip()) > 20
+    assert text_coverage(page) < EMPTY_CONTENT_RATIO
+    assert is_empty_page(page)
+
+def test_page_of_text_is_not_empty():
+    doc, page = new_page()
+    page.insert_text((50, 60), "a line of body text to fill the page\n" * 60, fontsize=11)
+    assert text_coverage(page) >= EMPTY_CONTENT_RATIO
+    assert not is_empty_page(page)
+
+def test_invisible_text_is_checked_for_ink():
+    # Large word boxes, but render mode 3 draws nothing
+    doc, page = new_page()
+    page.insert_text((50, 60), "hidden text layer\n" * 40, fontsize=20, render_mode=3)
+    assert text_coverage(page) >= EMPTY_CONTENT_RATIO
+    assert is_empty_page(page)
+
+def test_drawing_is_checked_for_ink():
+    doc, page = new_page()
+    page.draw_rect(fitz.Rect(50, 50, 545, 400), color=(0, 0, 0), fill=(0.2, 0.2, 0.2))
+    assert not is_empty_page(page)
+
+def test_faint_image_is_empty():
+    doc, page = new_page()
+    out = io.BytesIO()
+    Image.new("RGB", (100, 100), "white").save(out, format="PNG")
+    page.insert_image(page.rect, stream=out.getvalue())
+    assert is_empty_page(page)